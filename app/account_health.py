@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.utils import timezone
+from app.delivery_errors import AccountCoolingDownError, AccountUnavailableError
+from app.models import AccountHealth
+
+def ensure_account_usable(account_id):
+    """
+    Checks the cached health only (no disk or network access) and raises if sending
+    would certainly fail. Unknown or stale health never blocks.
+    """
+    health = AccountHealth.objects.filter(account_id=account_id).first()
+    if health is None:
+        return
+
+    now = timezone.now()
+    if health.flood_wait_until and health.flood_wait_until > now:
+        raise AccountCoolingDownError(int((health.flood_wait_until - now).total_seconds()) + 1)
+    if health.is_fresh and health.is_authorized is False:
+        raise AccountUnavailableError(f"Account {account_id} is not authorized: {health.last_error or 'no session'}")
+
+def record_probe(account_id, is_authorized, error=None):
+    """is_authorized is None when the probe itself failed, which leaves sending unblocked."""
+    _upsert(account_id, is_authorized=is_authorized, last_error=error, checked_at=timezone.now())
+
+def record_flood_wait(account_id, seconds):
+    _upsert(account_id, flood_wait_until=timezone.now() + timedelta(seconds=seconds))
+
+def record_success(account_id):
+    _upsert(account_id, last_success_at=timezone.now())
+
+def record_account_error(account_id, error, deauthorized):
+    fields = {'last_error': error}
+    if deauthorized:
+        fields.update(is_authorized=False, checked_at=timezone.now())
+    _upsert(account_id, **fields)
+
+def _upsert(account_id, **fields):
+    AccountHealth.objects.update_or_create(account_id=account_id, defaults=fields)
\ No newline at end of file
@@ -1,48 +1,148 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db.models import Q, Sum
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.html import format_html
-from app.models import LogEntry
-from app.models import TelegramAccount, Recipient, ScheduledMessage, MessageLog
+from app.models import DeliveryReservation, DeliveryRollup, LogEntry, MessageLogArchive, TaskProfile
+from app.models import TelegramAccount, Recipient, RecipientHealth, ScheduledMessage, MessageLog
 
 @admin.register(TelegramAccount)
 class TelegramAccountAdmin(admin.ModelAdmin):
-    list_display = ('name', 'phone', 'is_active', 'session_status')
+    list_display = ('name', 'phone', 'is_active', 'session_status', 'flood_wait_until', 'last_success_at')
+    list_select_related = ('health',)
+    actions = ['probe_health']
     
     def session_status(self, obj):
-        import os
-        if os.path.exists(obj.session_path):
-            return "✅ Session File Exists"
-        return "❌ Missing Session"
+        # Reads the cached probe result only; no disk or network access per row
+        health = getattr(obj, 'health', None)
+        if health is None or health.is_authorized is None:
+            return "❔ Not Checked"
+        suffix = "" if health.is_fresh else " (stale)"
+        if health.is_authorized:
+            return f"✅ Authorized{suffix}"
+        return f"❌ Not Authorized{suffix}"
+
+    def flood_wait_until(self, obj):
+        health = getattr(obj, 'health', None)
+        if health and health.flood_wait_until and health.flood_wait_until > timezone.now():
+            return health.flood_wait_until
+        return "-"
+
+    def last_success_at(self, obj):
+        health = getattr(obj, 'health', None)
+        return health.last_success_at if health and health.last_success_at else "-"
+
+    @admin.action(description="Probe session health now")
+    def probe_health(self, request, queryset):
+        from app.tasks import probe_account_health
+        probe_account_health.delay(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, "Health probe queued.")
 
 @admin.register(Recipient)
 class RecipientAdmin(admin.ModelAdmin):
-    list_display = ('username', 'name')
+    list_display = ('username', 'name', 'deliverability', 'last_error_kind')
+    list_select_related = ('health',)
+    list_filter = ('health__last_error_kind',)
     search_fields = ('username', 'name')
+    actions = ['reset_health']
+
+    def deliverability(self, obj):
+        health = getattr(obj, 'health', None)
+        return f"{health.deliverability:.2f}" if health else "-"
+
+    def last_error_kind(self, obj):
+        health = getattr(obj, 'health', None)
+        return health.last_error_kind if health and health.last_error_kind else "-"
+
+    @admin.action(description="Reset delivery health (stop skipping)")
+    def reset_health(self, request, queryset):
+        count, _ = RecipientHealth.objects.filter(recipient__in=queryset).delete()
+        self.message_user(request, f"Health reset for {count} recipients.")
 
 class MessageLogInline(admin.TabularInline):
     model = MessageLog
-    readonly_fields = ('recipient', 'status', 'error_text', 'created_at')
+    readonly_fields = ('recipient', 'status', 'error_kind', 'error_text', 'created_at')
     can_delete = False
     extra = 0
 
+class ScheduledMessageActionForm(ActionForm):
+    scheduled_at = forms.CharField(
+        required=False,
+        label='New time',
+        help_text='Used by "Reschedule", format YYYY-MM-DD HH:MM',
+    )
+
 @admin.register(ScheduledMessage)
 class ScheduledMessageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'account', 'scheduled_at', 'status', 'recipients_count')
+    list_display = ('id', 'account', 'scheduled_at', 'status', 'recipients_count', 'progress_link')
     list_filter = ('status', 'scheduled_at')
     filter_horizontal = ('recipients',)
     inlines = [MessageLogInline]
-    actions = ['force_send_now']
+    actions = ['force_send_now', 'reschedule_messages', 'cancel_messages']
+    action_form = ScheduledMessageActionForm
 
     def recipients_count(self, obj):
         return obj.recipients.count()
 
+    def progress_link(self, obj):
+        url = reverse('admin:app_scheduledmessage_progress', args=[obj.pk])
+        return format_html('<a href="{}">Live progress</a>', url)
+    progress_link.short_description = 'Progress'
+
+    def get_urls(self):
+        urls = [
+            path(
+                '<int:object_id>/progress/',
+                self.admin_site.admin_view(self.progress_view),
+                name='app_scheduledmessage_progress',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def progress_view(self, request, object_id):
+        """
+        Renders an empty page that subscribes to the message's progress group;
+        counters arrive over the websocket instead of being recomputed per refresh.
+        """
+        message = get_object_or_404(ScheduledMessage, pk=object_id)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'original': message,
+            'title': f"Delivery progress: message #{message.pk}",
+            'socket_path': f"/ws/messages/{message.pk}/progress/",
+        }
+        return TemplateResponse(request, 'admin/app/scheduledmessage/progress.html', context)
+
     @admin.action(description="Force Send Now (Ignore Schedule)")
     def force_send_now(self, request, queryset):
-        from app.tasks import schedule_message_group
-        for msg in queryset:
-            schedule_message_group.delay(msg.id)
-            msg.status = 'SCHEDULED'
-            msg.save()
-        self.message_user(request, "Selected messages queued for immediate execution.")
+        count = queryset.send_now()
+        self.message_user(request, f"{count} messages queued for immediate execution.")
+
+    @admin.action(description="Reschedule to the given time")
+    def reschedule_messages(self, request, queryset):
+        try:
+            scheduled_at = parse_datetime(request.POST.get('scheduled_at', '').strip())
+        except ValueError:
+            # Well formed but impossible, e.g. month 13
+            scheduled_at = None
+        if scheduled_at is None:
+            self.message_user(request, "Enter the new time as YYYY-MM-DD HH:MM.", messages.ERROR)
+            return
+        if timezone.is_naive(scheduled_at):
+            scheduled_at = timezone.make_aware(scheduled_at)
+        count = queryset.reschedule(scheduled_at)
+        self.message_user(request, f"{count} messages rescheduled to {scheduled_at:%Y-%m-%d %H:%M %Z}.")
+
+    @admin.action(description="Cancel (revoke queued sends)")
+    def cancel_messages(self, request, queryset):
+        count = queryset.cancel()
+        self.message_user(request, f"{count} messages cancelled.")
 
 
 @admin.register(LogEntry)
@@ -55,5 +155,84 @@ class LogEntryAdmin(admin.ModelAdmin):
     def message_preview(self, obj):
         return obj.message[:50] + "..." if len(obj.message) > 50 else obj.message
     
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DeliveryReservation)
+class DeliveryReservationAdmin(admin.ModelAdmin):
+    list_display = ('message', 'recipient', 'state', 'reserved_at', 'updated_at')
+    list_filter = ('state',)
+    list_select_related = ('message', 'recipient')
+    raw_id_fields = ('message', 'recipient')
+    readonly_fields = ('token', 'reserved_at')
+
+@admin.register(DeliveryRollup)
+class DeliveryRollupAdmin(admin.ModelAdmin):
+    """Delivery reports; every figure is summed from the pre-aggregated rollups, never from MessageLog."""
+    list_display = ('bucket_start', 'period', 'account', 'status', 'error_kind', 'count')
+    list_filter = ('period', 'account', 'status', 'error_kind')
+    list_select_related = ('account',)
+    date_hierarchy = 'bucket_start'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # Hourly and daily rows count the same logs twice; report on one period at a time
+        queryset = super().get_queryset(request)
+        if 'period__exact' not in request.GET:
+            queryset = queryset.filter(period='DAY')
+        return queryset
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is None:
+            return response
+
+        queryset = changelist.queryset
+        response.context_data['report_rows'] = (
+            queryset
+            .values('bucket_start', 'account__name')
+            .annotate(
+                sent=Sum('count', filter=Q(status='SENT'), default=0),
+                failed=Sum('count', filter=Q(status='FAILED'), default=0),
+                skipped=Sum('count', filter=Q(status='SKIPPED'), default=0),
+            )
+            .order_by('-bucket_start', 'account__name')[:100]
+        )
+        response.context_data['error_rows'] = (
+            queryset
+            .filter(status__in=['FAILED', 'SKIPPED'])
+            .values('error_kind')
+            .annotate(total=Sum('count'))
+            .order_by('-total')
+        )
+        return response
+
+@admin.register(MessageLogArchive)
+class MessageLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ('original_id', 'message_id', 'recipient_id', 'status', 'error_kind', 'created_at')
+    list_filter = ('status', 'error_kind')
+    search_fields = ('message_id', 'error_text')
+    readonly_fields = [field.name for field in MessageLogArchive._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(TaskProfile)
+class TaskProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at', 'task_name', 'duration_ms', 'db_time_ms', 'network_time_ms',
+        'python_time_ms', 'query_count', 'duplicate_query_count', 'slowest_query_ms',
+    )
+    list_filter = ('task_name', 'created_at')
+    search_fields = ('task_id', 'slowest_query')
+    readonly_fields = [field.name for field in TaskProfile._meta.fields]
+
     def has_add_permission(self, request):
         return False
\ No newline at end of file
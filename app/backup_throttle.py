@@ -0,0 +1,113 @@
+import logging
+import shutil
+import time
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+def low_priority_command(command):
+    """Prefixes a subprocess command with nice/ionice when they are available."""
+    prefix = []
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', str(settings.BACKUP_NICE)]
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c', str(settings.BACKUP_IONICE_CLASS)]
+        if settings.BACKUP_IONICE_CLASS == 2:
+            prefix += ['-n', str(settings.BACKUP_IONICE_LEVEL)]
+    return prefix + command
+
+def current_queue_lag():
+    """
+    Seconds the oldest due-but-unstarted queued message has been waiting, 0 if none.
+    PENDING rows are ignored: they were never queued, and a forgotten one would pause every backup.
+    """
+    from app.models import ScheduledMessage
+
+    now = timezone.now()
+    oldest = (
+        ScheduledMessage.objects
+        .filter(status='SCHEDULED', scheduled_at__lte=now)
+        .order_by('scheduled_at')
+        .values_list('scheduled_at', flat=True)
+        .first()
+    )
+    return (now - oldest).total_seconds() if oldest else 0.0
+
+class IOThrottle:
+    """
+    Caps throughput (bytes/s) and operation rate (ops/s) of a copy loop by sleeping.
+    In adaptive mode it slows down or pauses while the send queue is lagging.
+    """
+    def __init__(self, bytes_per_second=None, ops_per_second=None, adaptive=None):
+        self.bytes_per_second = settings.BACKUP_BANDWIDTH_LIMIT if bytes_per_second is None else bytes_per_second
+        self.ops_per_second = settings.BACKUP_IOPS_LIMIT if ops_per_second is None else ops_per_second
+        self.adaptive = settings.BACKUP_ADAPTIVE if adaptive is None else adaptive
+        self._slowdown = 1
+        self._paused_for = 0.0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_ops = 0
+        self._last_lag_check = 0.0
+
+    def consume(self, size):
+        self._window_bytes += size
+        self._window_ops += 1
+
+        if self.adaptive:
+            self._adapt()
+
+        required = 0.0
+        if self.bytes_per_second:
+            required = max(required, self._window_bytes * self._slowdown / self.bytes_per_second)
+        if self.ops_per_second:
+            required = max(required, self._window_ops * self._slowdown / self.ops_per_second)
+        elapsed = time.monotonic() - self._window_start
+        if required > elapsed:
+            time.sleep(required - elapsed)
+
+    def _adapt(self):
+        now = time.monotonic()
+        if now - self._last_lag_check < settings.BACKUP_LAG_CHECK_INTERVAL:
+            return
+        self._last_lag_check = now
+
+        lag = current_queue_lag()
+        while lag >= settings.BACKUP_PAUSE_QUEUE_LAG and self._paused_for < settings.BACKUP_MAX_PAUSE:
+            logger.info(f"Send queue lags {lag:.0f}s, pausing backup I/O.")
+            time.sleep(settings.BACKUP_LAG_CHECK_INTERVAL)
+            self._paused_for += settings.BACKUP_LAG_CHECK_INTERVAL
+            lag = current_queue_lag()
+
+        self._slowdown = 4 if lag >= settings.BACKUP_SLOWDOWN_QUEUE_LAG else 1
+        # Restart the rate window so neither a pause nor a speed change is "paid back" later
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_ops = 0
+
+def copy_throttled(source, target, throttle):
+    total = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            return total
+        target.write(chunk)
+        total += len(chunk)
+        throttle.consume(len(chunk))
+
+class ThrottledReader:
+    """File wrapper whose reads go through an IOThrottle, used for Drive uploads."""
+    def __init__(self, file, throttle):
+        self._file = file
+        self._throttle = throttle
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        if data:
+            self._throttle.consume(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
@@ -1,8 +1,43 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_process_shutdown
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 app = Celery('app')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+from django.conf import settings  # noqa: E402
+
+app.conf.beat_schedule = {
+    'nightly-backup': {
+        'task': 'app.tasks.perform_backup_task',
+        'schedule': crontab(hour=settings.BACKUP_SCHEDULE_HOUR, minute=0),
+    },
+    'probe-account-health': {
+        'task': 'app.tasks.probe_account_health',
+        'schedule': settings.ACCOUNT_HEALTH_PROBE_INTERVAL,
+    },
+    'recover-stale-reservations': {
+        'task': 'app.tasks.recover_stale_reservations',
+        'schedule': settings.STALE_RESERVATION_CHECK_INTERVAL,
+    },
+    'rollup-message-logs': {
+        'task': 'app.tasks.rollup_message_logs',
+        'schedule': settings.ROLLUP_INTERVAL,
+    },
+    'archive-message-logs': {
+        'task': 'app.tasks.archive_message_logs',
+        'schedule': crontab(hour=settings.BACKUP_SCHEDULE_HOUR, minute=30),
+    },
+}
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    # Drops the exiting child's live gauges from the multiprocess metrics
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,46 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from app.models import ScheduledMessage
+from app.progress import delivery_states, progress_counts, progress_group
+
+class MessageProgressConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_staff:
+            await self.close()
+            return
+
+        self.message_id = self.scope['url_route']['kwargs']['message_id']
+        self.group_name = progress_group(self.message_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        snapshot = await self._snapshot()
+        if snapshot:
+            await self.send_json(snapshot)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def progress_update(self, event):
+        await self.send_json({key: value for key, value in event.items() if key != 'type'})
+
+    @database_sync_to_async
+    def _snapshot(self):
+        """Initial state for a freshly opened page; afterwards only pushed updates are used."""
+        message = ScheduledMessage.objects.filter(id=self.message_id).only('status').first()
+        if message is None:
+            return None
+
+        total, sent, failed = progress_counts(message.recipients.count(), delivery_states(message.id))
+        return {
+            'message_id': message.id,
+            'total': total,
+            'sent': sent,
+            'failed': failed,
+            'remaining': max(total - sent - failed, 0),
+            'rate': None,
+            'eta_seconds': None,
+            'final': message.status in ('SENT', 'FAILED', 'CANCELLED'),
+        }
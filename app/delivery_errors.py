@@ -0,0 +1,63 @@
+from telethon import errors
+
+# The recipient can never be reached (deleted, blocked us, privacy settings, bad username)
+PERMANENT = 'PERMANENT'
+# Worth retrying later (timeouts, Telegram internal errors)
+TRANSIENT = 'TRANSIENT'
+# The sending account itself is unusable; every further recipient would fail the same way
+ACCOUNT = 'ACCOUNT'
+
+PERMANENT_ERRORS = (
+    errors.InputUserDeactivatedError,
+    errors.UserIsBlockedError,
+    errors.UserPrivacyRestrictedError,
+    errors.UsernameInvalidError,
+    errors.UsernameNotOccupiedError,
+    errors.PeerIdInvalidError,
+    errors.UserIsBotError,
+    errors.ChatWriteForbiddenError,
+)
+
+UNRESOLVABLE_ENTITY_MESSAGES = (
+    'Cannot find any entity corresponding to',
+    'No user has',
+)
+
+class SessionNotAuthorizedError(Exception):
+    pass
+
+# Account errors meaning the session can no longer be used at all
+AUTH_ERRORS = (
+    SessionNotAuthorizedError,
+    errors.AuthKeyUnregisteredError,
+    errors.AuthKeyDuplicatedError,
+    errors.SessionRevokedError,
+    errors.UserDeactivatedError,
+    errors.UserDeactivatedBanError,
+    errors.PhoneNumberBannedError,
+)
+
+ACCOUNT_ERRORS = AUTH_ERRORS + (
+    errors.PeerFloodError,
+)
+
+class AccountUnavailableError(Exception):
+    """Raised to abort a batch once an account-level error has been seen."""
+    pass
+
+class AccountCoolingDownError(Exception):
+    """The account is still inside a known FloodWait window; retry after `seconds`."""
+    def __init__(self, seconds):
+        super().__init__(f"Account is in FloodWait for another {seconds} seconds")
+        self.seconds = seconds
+
+def classify_error(exc):
+    if isinstance(exc, ACCOUNT_ERRORS):
+        return ACCOUNT
+    if isinstance(exc, PERMANENT_ERRORS):
+        return PERMANENT
+    # Telethon raises ValueError when a username or phone cannot be resolved to an entity,
+    # but also for exhausted retries, unusable media or an empty text; only the former is the recipient's fault
+    if isinstance(exc, ValueError) and str(exc).startswith(UNRESOLVABLE_ENTITY_MESSAGES):
+        return PERMANENT
+    return TRANSIENT
\ No newline at end of file
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+
+def enqueue_messages(message_ids, eta=None):
+    """
+    Queues one send per message and returns {message_id: task_id}.
+    Task ids are generated up front so callers can store them in a single bulk update;
+    publishing waits for the surrounding transaction so a task never sees stale rows.
+    The async send worker's Redis queue is keyed by message id; it gets a claim token instead,
+    stored in the same column so both backends notice a reschedule the same way.
+    """
+    from celery.utils import uuid
+
+    message_ids = list(message_ids)
+
+    if settings.SEND_BACKEND == 'async_worker':
+        from app import send_queue
+
+        transaction.on_commit(lambda: send_queue.push(message_ids, eta))
+        return {message_id: uuid() for message_id in message_ids}
+
+    from app.tasks import schedule_message_group
+
+    task_ids = {message_id: uuid() for message_id in message_ids}
+
+    def _publish():
+        for message_id, task_id in task_ids.items():
+            schedule_message_group.apply_async(args=[message_id], eta=eta, task_id=task_id)
+
+    transaction.on_commit(_publish)
+    return task_ids
+
+def revoke_tasks(task_ids):
+    """
+    Revokes queued tasks with a single broadcast to the workers.
+    The async send worker stores claim tokens rather than Celery task ids, so nothing is revoked there.
+    """
+    if settings.SEND_BACKEND != 'celery':
+        return
+    task_ids = [task_id for task_id in task_ids if task_id]
+    if task_ids:
+        from celery import current_app
+
+        current_app.control.revoke(task_ids)
+
+def cancel_queued(rows):
+    """Drops queued work for (message_id, task_id) rows from whichever backend holds it."""
+    revoke_tasks([task_id for _, task_id in rows])
+    if settings.SEND_BACKEND == 'async_worker':
+        from app import send_queue
+
+        send_queue.remove([message_id for message_id, _ in rows])
\ No newline at end of file
@@ -3,12 +3,10 @@ import time
 import json
 import logging
 import subprocess
-import glob
-import zipfile
 from django.conf import settings
-from oauth2client.service_account import ServiceAccountCredentials
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
+from app.backup_throttle import IOThrottle, ThrottledReader, copy_throttled, low_priority_command
+from app.metrics import BACKUP_BYTES, BACKUP_DURATION
+from app.profiling import track_network
 
 class BackupManager:
     _instance = None
@@ -36,45 +34,43 @@ class BackupManager:
         remote_db_name = "telegram_scheduler_db.dump" 
         local_db_dump = os.path.join(data_dir, f"temp_db_{int(time.time())}.dump")
         
-        self._dump_database(local_db_dump)
+        with BACKUP_DURATION.labels(stage='db_dump').time():
+            self._dump_database(local_db_dump)
         if os.path.exists(local_db_dump):
-            self._update_existing_file_only(drive, local_db_dump, remote_db_name)
+            BACKUP_BYTES.labels(artifact='db_dump').inc(os.path.getsize(local_db_dump))
+            with BACKUP_DURATION.labels(stage='db_upload').time():
+                self._update_existing_file_only(drive, local_db_dump, remote_db_name)
             os.remove(local_db_dump)
 
-        # 2. Backup Sessions (Zip -> Upload -> Delete)
-        # Requirement: Archive sessions and upload as a single file
-        remote_archive_name = "telegram_sessions.zip"
-        local_archive_path = os.path.join(data_dir, f"temp_sessions_{int(time.time())}.zip")
-        
-        session_files = glob.glob(os.path.join(data_dir, "*.session"))
-        if session_files:
-            try:
-                with zipfile.ZipFile(local_archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for file in session_files:
-                        zipf.write(file, os.path.basename(file))
-                
-                logging.info(f"Zipped {len(session_files)} sessions into {local_archive_path}")
-                self._update_existing_file_only(drive, local_archive_path, remote_archive_name)
-            except Exception as e:
-                logging.error(f"Failed to zip sessions: {e}")
-            finally:
-                if os.path.exists(local_archive_path):
-                    os.remove(local_archive_path)
-        else:
-            logging.info("No session files found to backup.")
+        # Telethon sessions live in the database (TelegramSession), so the dump above covers them
 
     def _dump_database(self, path):
+        """
+        Streams pg_dump output through an IOThrottle into `path`. pg_dump reads everything
+        inside one snapshot, so the dump (sessions included) is consistent however long it is throttled.
+        """
         try:
             db_conf = settings.DATABASES['default']
             env = os.environ.copy()
             env['PGPASSWORD'] = db_conf['PASSWORD']
-            command = [
+            command = low_priority_command([
                 'pg_dump', '-h', db_conf['HOST'], '-p', str(db_conf['PORT']),
-                '-U', db_conf['USER'], '-F', 'c', '-b', '-v', '-f', path, db_conf['NAME']
-            ]
-            subprocess.run(command, env=env, check=True)
+                '-U', db_conf['USER'], '-F', 'c', '-b', '-v', db_conf['NAME']
+            ])
+            with open(path, 'wb') as output:
+                process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE)
+                try:
+                    copy_throttled(process.stdout, output, IOThrottle())
+                finally:
+                    process.stdout.close()
+                    returncode = process.wait()
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, command)
         except Exception as e:
             logging.error(f"DB Dump failed: {e}")
+            # Never upload a truncated dump over the last good one
+            if os.path.exists(path):
+                os.remove(path)
 
     def _get_drive_service(self):
         if not getattr(settings, 'GOOGLE_DRIVE_CREDENTIALS_JSON', None):
@@ -83,6 +79,11 @@ class BackupManager:
         try:
             if self._drive:
                 return self._drive
+            # Imported here: the Google client stack is heavy and only backups need it
+            from oauth2client.service_account import ServiceAccountCredentials
+            from pydrive2.auth import GoogleAuth
+            from pydrive2.drive import GoogleDrive
+
             creds_dict = json.loads(settings.GOOGLE_DRIVE_CREDENTIALS_JSON)
             gauth = GoogleAuth()
             scope = ['https://www.googleapis.com/auth/drive']
@@ -119,7 +120,10 @@ class BackupManager:
             if file_id:
                 g_file = drive.CreateFile({'id': file_id})
                 g_file.SetContentFile(local_path)
-                g_file.Upload()
+                g_file.content = ThrottledReader(g_file.content, IOThrottle(ops_per_second=0))
+                _upload_in_chunks(g_file)
+                with track_network():
+                    g_file.Upload()
                 logging.info(f'Successfully updated existing file: {remote_name}')
             else:
                 logging.warning(
@@ -144,10 +148,8 @@ class BackupManager:
 
         data_dir = settings.DATA_DIR
         remote_db_name = "telegram_scheduler_db.dump"
-        remote_archive_name = "telegram_sessions.zip"
         
         local_db_dump = os.path.join(data_dir, f"restore_db_{int(time.time())}.dump")
-        local_archive_path = os.path.join(data_dir, f"restore_sessions_{int(time.time())}.zip")
 
         try:
             logging.info("Downloading database dump...")
@@ -156,17 +158,9 @@ class BackupManager:
             else:
                 logging.error(f"Remote file {remote_db_name} not found.")
 
-            logging.info("Downloading sessions archive...")
-            if self._download_file(drive, remote_archive_name, local_archive_path):
-                self._restore_sessions(local_archive_path, data_dir)
-            else:
-                logging.error(f"Remote file {remote_archive_name} not found.")
-
         finally:
             if os.path.exists(local_db_dump):
                 os.remove(local_db_dump)
-            if os.path.exists(local_archive_path):
-                os.remove(local_archive_path)
 
     def _download_file(self, drive, filename, target_path):
         file_id = self._get_file_id(drive, filename)
@@ -196,11 +190,18 @@ class BackupManager:
             logging.error(f"pg_restore failed: {e}")
             raise e
 
-    def _restore_sessions(self, zip_path, target_dir):
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zipf:
-                zipf.extractall(target_dir)
-            logging.info(f"Sessions extracted to {target_dir}")
-        except Exception as e:
-            logging.error(f"Failed to extract sessions: {e}")
-            raise e
\ No newline at end of file
+def _upload_in_chunks(g_file):
+    """
+    pydrive2 uploads with a 100 MB chunk, so a dump would be read (and throttled) in one go.
+    Small chunks make the resumable upload read through the throttle chunk by chunk.
+    """
+    from googleapiclient.http import MediaIoBaseUpload
+
+    def build_media_body():
+        if g_file.get('mimeType') is None:
+            g_file['mimeType'] = 'application/octet-stream'
+        return MediaIoBaseUpload(
+            g_file.content, g_file['mimeType'], chunksize=settings.BACKUP_UPLOAD_CHUNK_SIZE, resumable=True
+        )
+
+    g_file._BuildMediaBody = build_media_body
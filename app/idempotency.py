@@ -0,0 +1,81 @@
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from app.models import DeliveryReservation, MessageLog
+
+def new_token():
+    return uuid.uuid4().hex
+
+def reserve(message_id, recipient_id, token):
+    """
+    Atomically takes the (message, recipient) send for `token`.
+    Returns False when it is already sent or another worker holds a live reservation.
+    FAILED, RELEASED and stale reservations can be taken over.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            DeliveryReservation.objects.create(
+                message_id=message_id, recipient_id=recipient_id,
+                state='SENDING', token=token, reserved_at=now,
+            )
+        return True
+    except IntegrityError:
+        pass
+
+    stale_before = now - timedelta(seconds=settings.SEND_RESERVATION_TTL)
+    claimed = (
+        DeliveryReservation.objects
+        .filter(message_id=message_id, recipient_id=recipient_id)
+        .filter(Q(state__in=['FAILED', 'RELEASED', 'STALE']) | Q(state='SENDING', reserved_at__lt=stale_before))
+        .update(state='SENDING', token=token, reserved_at=now, updated_at=now)
+    )
+    return claimed == 1
+
+def complete(msg_obj, recipient, token, status, error_text=None, error_kind=None):
+    """Finalizes our reservation and writes the MessageLog in one transaction."""
+    with transaction.atomic():
+        DeliveryReservation.objects.filter(
+            message=msg_obj, recipient=recipient, token=token
+        ).update(state=status, updated_at=timezone.now())
+        MessageLog.objects.create(
+            message=msg_obj, recipient=recipient, status=status, error_text=error_text, error_kind=error_kind
+        )
+
+def release(message_id, recipient_id, token):
+    """
+    Gives a reservation back when the send did not complete (FloodWait, cancellation, shutdown).
+    RELEASED has no MessageLog behind it, so the recipient still counts as unfinished.
+    """
+    DeliveryReservation.objects.filter(
+        message_id=message_id, recipient_id=recipient_id, token=token, state='SENDING'
+    ).update(state='RELEASED', updated_at=timezone.now())
+
+def unfinished_recipients(message_id, recipient_ids):
+    """
+    Returns the ids among `recipient_ids` without a recorded outcome for the message.
+    complete() writes the SENT/FAILED state together with its MessageLog, so this is the same
+    as lacking a log from the current round of reservations.
+    """
+    finished = set(
+        DeliveryReservation.objects
+        .filter(message_id=message_id, recipient_id__in=recipient_ids, state__in=['SENT', 'FAILED'])
+        .values_list('recipient_id', flat=True)
+    )
+    return [recipient_id for recipient_id in recipient_ids if recipient_id not in finished]
+
+def mark_stale_reservations():
+    """
+    Flags SENDING reservations older than SEND_RESERVATION_TTL, left behind by crashed workers.
+    Returns the ids of the affected messages.
+    """
+    stale = DeliveryReservation.objects.filter(
+        state='SENDING', reserved_at__lt=timezone.now() - timedelta(seconds=settings.SEND_RESERVATION_TTL)
+    )
+    message_ids = set(stale.values_list('message_id', flat=True))
+    if message_ids:
+        stale.filter(message_id__in=message_ids).update(state='STALE', updated_at=timezone.now())
+    return message_ids
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -10,6 +11,8 @@ class DatabaseLogHandler(logging.Handler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._log_entry_model = None
+        # Deliveries scheduled on event loops; referenced until done so they are not garbage collected
+        self._pending = set()
 
     @property
     def log_entry_model(self):
@@ -22,35 +25,68 @@ class DatabaseLogHandler(logging.Handler):
             return
 
         try:
-            now = timezone.now()
-            msg = record.getMessage()
-
+            entry = {
+                'created_at': timezone.now(),
+                'level': record.levelname,
+                'module': record.module,
+                'message': record.getMessage(),
+            }
             try:
-                self.log_entry_model.objects.create(
-                    level=record.levelname[:10],
-                    module=record.module[:100],
-                    message=msg,
-                    created_at=now,
-                    updated_at=now,
-                )
-            except (OperationalError, ProgrammingError):
-                return
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
 
+            if loop is None:
+                if self._store(entry):
+                    channel_layer = get_channel_layer()
+                    if channel_layer:
+                        async_to_sync(channel_layer.group_send)('logs', self._log_message(entry))
+                    if record.levelno >= logging.ERROR:
+                        self._send_dev_log(entry)
+            else:
+                # Neither the ORM nor async_to_sync may run on an event loop: deliver from a task instead
+                task = loop.create_task(self._emit_async(record, entry))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+
+        except Exception:
+            self.handleError(record)
+
+    async def _emit_async(self, record, entry):
+        try:
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, self._store, entry):
+                return
             channel_layer = get_channel_layer()
             if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    'logs',
-                    {
-                        'type': 'log_message',
-                        'created_at': now.strftime('%H:%M:%S'),
-                        'level': record.levelname,
-                        'module': record.module,
-                        'message': msg,
-                    },
-                )
-
+                await channel_layer.group_send('logs', self._log_message(entry))
             if record.levelno >= logging.ERROR:
-                TelegramSender().send_dev_log(record.levelname, record.module, msg)
-
+                await loop.run_in_executor(None, self._send_dev_log, entry)
         except Exception:
-            self.handleError(record)
\ No newline at end of file
+            self.handleError(record)
+
+    def _store(self, entry):
+        """Writes the LogEntry; False while the table is unavailable (e.g. before migrations)."""
+        try:
+            self.log_entry_model.objects.create(
+                level=entry['level'][:10],
+                module=entry['module'][:100],
+                message=entry['message'],
+                created_at=entry['created_at'],
+                updated_at=entry['created_at'],
+            )
+        except (OperationalError, ProgrammingError):
+            return False
+        return True
+
+    def _log_message(self, entry):
+        return {
+            'type': 'log_message',
+            'created_at': entry['created_at'].strftime('%H:%M:%S'),
+            'level': entry['level'],
+            'module': entry['module'],
+            'message': entry['message'],
+        }
+
+    def _send_dev_log(self, entry):
+        TelegramSender().send_dev_log(entry['level'], entry['module'], entry['message'])
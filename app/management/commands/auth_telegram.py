@@ -1,10 +1,11 @@
-import os
 from django.core.management.base import BaseCommand
 from telethon.sync import TelegramClient
-from app.models import TelegramAccount
+from app.account_health import record_probe
+from app.models import AccountHealth, TelegramAccount
+from app.telegram_sessions import DatabaseSession, flush
 
 class Command(BaseCommand):
-    help = 'Interactive login to generate session file'
+    help = 'Interactive login to store an authorized session in the database'
 
     def add_arguments(self, parser):
         parser.add_argument('account_id', type=int, nargs='?', help='Target Account ID')
@@ -14,8 +15,12 @@ class Command(BaseCommand):
 
         if not account_id:
             self.stdout.write("=== Available Telegram Accounts ===")
+            authorized = dict(AccountHealth.objects.values_list('account_id', 'is_authorized'))
             for acc in TelegramAccount.objects.all():
-                status = "✅ Ready" if os.path.exists(acc.session_path) else "❌ Missing Session"
+                status = {
+                    True: "✅ Ready",
+                    False: "❌ Not Authorized",
+                }.get(authorized.get(acc.id), "❔ Not Checked")
                 self.stdout.write(f"ID: {acc.id} | Phone: {acc.phone} | Name: {acc.name} | Status: {status}")
             self.stdout.write("\nUsage: python manage.py auth_telegram <account_id>")
             return
@@ -28,15 +33,15 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Starting authentication for {account.phone} (ID: {account.id})...")
         
-        os.makedirs(os.path.dirname(account.session_path), exist_ok=True)
-        
-        client = TelegramClient(account.session_path, account.api_id, account.api_hash)
+        client = TelegramClient(DatabaseSession(account.id), account.api_id, account.api_hash)
         
         client.start(phone=account.phone)
+        authorized = client.is_user_authorized()
+        client.disconnect()
+        flush()
+        record_probe(account.id, authorized)
         
-        if os.path.exists(account.session_path):
-            self.stdout.write(self.style.SUCCESS(f"Success! Session saved at: {account.session_path}"))
+        if authorized:
+            self.stdout.write(self.style.SUCCESS(f"Success! Session saved in the database for account {account.id}."))
         else:
-            self.stderr.write("Session file was not created.")
-            
-        client.disconnect()
\ No newline at end of file
+            self.stderr.write("Session was not authorized.")
\ No newline at end of file
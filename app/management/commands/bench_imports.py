@@ -0,0 +1,100 @@
+import re
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import CommandError
+from app.management.base import LoggableBaseCommand
+
+SETUP = (
+    "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings'); "
+    "import django; django.setup(); "
+)
+
+# What each process imports before it can serve its first request / task / tick
+ROLES = {
+    'manage': SETUP + "from django.core.management import ManagementUtility",
+    'web': (
+        "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings'); "
+        "import app.asgi; from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    'worker': SETUP + "import app.celery; app.celery.app.loader.import_default_modules(); import celery.apps.worker",
+    'beat': SETUP + "import app.celery; app.celery.app.loader.import_default_modules(); import celery.apps.beat",
+}
+
+# Heavy packages a role must not import at startup; they belong behind lazy imports
+FORBIDDEN = {
+    'manage': ('telethon', 'pydrive2', 'oauth2client', 'googleapiclient'),
+    'web': ('telethon', 'pydrive2', 'oauth2client', 'googleapiclient'),
+    'beat': ('pydrive2', 'oauth2client', 'googleapiclient'),
+}
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+class Command(LoggableBaseCommand):
+    help = 'Measures cold-start import time per process role with python -X importtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('roles', nargs='*', help=f"Roles to measure: {', '.join(ROLES)} (default: all)")
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per role; the fastest one is reported')
+        parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list')
+        parser.add_argument('--no-fail', action='store_true', help='Do not exit with an error when over budget')
+
+    def handle(self, *args, **options):
+        roles = options['roles'] or list(ROLES)
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise CommandError(f"Unknown roles: {', '.join(sorted(unknown))}")
+
+        over_budget = []
+        for role in roles:
+            runs = [self._measure(role) for _ in range(max(options['repeat'], 1))]
+            total_us, modules, imported = min(runs, key=lambda run: run[0])
+            total_ms = total_us / 1000
+            budget = settings.IMPORT_TIME_BUDGET_MS.get(role)
+
+            verdict = ''
+            if budget:
+                verdict = f" (budget {budget} ms)"
+                if total_ms > budget:
+                    over_budget.append(role)
+                    verdict = self.style.ERROR(f" OVER budget {budget} ms")
+            self.stdout.write(f"{role}: {total_ms:.0f} ms{verdict}")
+
+            slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:options['top']]
+            for name, cumulative_us in slowest:
+                self.stdout.write(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+            leaked = sorted({name.split('.')[0] for name in imported} & set(FORBIDDEN.get(role, ())))
+            if leaked:
+                over_budget.append(role)
+                self.stdout.write(self.style.ERROR(f"    imports {', '.join(leaked)} at startup"))
+
+        if over_budget and not options['no_fail']:
+            raise CommandError(f"Import budget exceeded for: {', '.join(over_budget)}")
+
+    def _measure(self, role):
+        """
+        Runs one fresh interpreter and returns
+        (total self time in us, {top-level module: cumulative us}, set of every imported module).
+        """
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', ROLES[role]],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Measuring '{role}' failed:\n{result.stderr[-2000:]}")
+
+        total = 0
+        top_level = {}
+        imported = set()
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, name = match.groups()
+            total += int(self_us)
+            imported.add(name)
+            # importtime indents nested imports by two spaces per level; one space means top level
+            if len(indent) == 1:
+                top_level[name] = top_level.get(name, 0) + int(cumulative_us)
+        return total, top_level, imported
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+from app.management.base import LoggableBaseCommand
+from app.models import TelegramAccount, TelegramEntity, TelegramSession
+
+class Command(LoggableBaseCommand):
+    help = 'Imports legacy Telethon .session files from /data into the database session store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Replace sessions already stored in the database')
+
+    def handle(self, *args, **options):
+        existing = set(TelegramSession.objects.values_list('account_id', flat=True))
+
+        for account in TelegramAccount.objects.all():
+            if not os.path.exists(account.session_path):
+                continue
+            if account.id in existing and not options['overwrite']:
+                self.stdout.write(f"Skipping {account}: session already stored in the database.")
+                continue
+
+            state, entities = self._read_session_file(account.session_path)
+            if state is None:
+                self.stderr.write(f"Skipping {account}: {account.session_path} holds no session.")
+                continue
+
+            dc_id, server_address, port, auth_key, takeout_id = state
+            TelegramSession.objects.update_or_create(
+                account=account,
+                defaults={
+                    'dc_id': dc_id,
+                    'server_address': server_address,
+                    'port': port,
+                    'auth_key': auth_key,
+                    'takeout_id': takeout_id,
+                },
+            )
+            TelegramEntity.objects.bulk_create(
+                [
+                    TelegramEntity(
+                        account=account, entity_id=entity_id, access_hash=access_hash,
+                        username=username, phone=phone, name=name,
+                    )
+                    for entity_id, access_hash, username, phone, name in entities
+                ],
+                update_conflicts=True,
+                unique_fields=['account', 'entity_id'],
+                update_fields=['access_hash', 'username', 'phone', 'name', 'updated_at'],
+            )
+            self.stdout.write(self.style.SUCCESS(f"Imported {account} with {len(entities)} cached entities."))
+
+    def _read_session_file(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            state = connection.execute(
+                'SELECT dc_id, server_address, port, auth_key, takeout_id FROM sessions'
+            ).fetchone()
+            entities = connection.execute('SELECT id, hash, username, phone, name FROM entities').fetchall()
+        finally:
+            connection.close()
+        return state, entities
\ No newline at end of file
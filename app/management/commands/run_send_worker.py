@@ -0,0 +1,14 @@
+import asyncio
+from app.management.base import LoggableBaseCommand
+from app.send_worker import SendWorker
+
+class Command(LoggableBaseCommand):
+    help = 'Runs the asyncio send worker that consumes due messages from Redis (SEND_BACKEND=async_worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Messages kept in flight at once')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between queue polls')
+
+    def handle(self, *args, **options):
+        worker = SendWorker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+        asyncio.run(worker.run())
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+from contextlib import contextmanager
+from django.db import connection
+
+# prometheus_client picks its value storage at import time, so the multiprocess
+# directory has to exist before the first metric is created.
+_multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if _multiproc_dir:
+    os.makedirs(_multiproc_dir, exist_ok=True)
+
+from prometheus_client import Counter, Gauge, Histogram  # noqa: E402
+
+SEND_ATTEMPTS = Counter(
+    'scheduler_send_attempts_total',
+    'Per-recipient send attempts',
+    ['account', 'status'],
+)
+SEND_LATENCY = Histogram(
+    'scheduler_send_latency_seconds',
+    'Time spent in a single Telegram send call',
+    ['account', 'status'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+FLOOD_WAIT_SECONDS = Histogram(
+    'scheduler_flood_wait_seconds',
+    'FloodWait durations requested by Telegram',
+    ['account'],
+    buckets=(5, 15, 30, 60, 300, 900, 3600, 86400),
+)
+QUEUE_LAG = Histogram(
+    'scheduler_queue_lag_seconds',
+    'Actual send time minus scheduled_at',
+    buckets=(1, 5, 15, 30, 60, 300, 900, 1800, 3600, 14400),
+)
+TASK_DB_QUERIES = Histogram(
+    'scheduler_task_db_queries',
+    'Number of ORM queries executed per task run',
+    ['task'],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+BACKUP_DURATION = Histogram(
+    'scheduler_backup_duration_seconds',
+    'Duration of backup stages',
+    ['stage'],
+    buckets=(1, 5, 15, 30, 60, 300, 900, 1800),
+)
+BACKUP_BYTES = Counter(
+    'scheduler_backup_bytes_total',
+    'Bytes produced by backup artifacts',
+    ['artifact'],
+)
+ACTIVE_CLIENTS = Gauge(
+    'scheduler_active_telegram_clients',
+    'Connected Telethon clients',
+    multiprocess_mode='livesum',
+)
+
+
+@contextmanager
+def track_db_queries(task_name):
+    """Counts queries issued on the current thread's connection while the block runs."""
+    count = 0
+
+    def _counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    try:
+        with connection.execute_wrapper(_counter):
+            yield
+    finally:
+        TASK_DB_QUERIES.labels(task=task_name).observe(count)
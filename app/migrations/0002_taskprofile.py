@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('task_name', models.CharField(db_index=True, max_length=100)),
+                ('task_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('duration_ms', models.FloatField()),
+                ('db_time_ms', models.FloatField()),
+                ('network_time_ms', models.FloatField()),
+                ('python_time_ms', models.FloatField()),
+                ('query_count', models.IntegerField()),
+                ('duplicate_query_count', models.IntegerField(help_text='Queries repeating an already executed SQL statement')),
+                ('duplicate_queries', models.JSONField(blank=True, default=list)),
+                ('slowest_query', models.TextField(blank=True)),
+                ('slowest_query_ms', models.FloatField(default=0)),
+                ('profile_file', models.CharField(blank=True, help_text='cProfile dump in /data/profiles/', max_length=255, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
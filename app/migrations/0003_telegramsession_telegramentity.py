@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_taskprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramSession',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='telegram_session', serialize=False, to='app.telegramaccount')),
+                ('dc_id', models.IntegerField(default=0)),
+                ('server_address', models.CharField(blank=True, max_length=255, null=True)),
+                ('port', models.IntegerField(blank=True, null=True)),
+                ('auth_key', models.BinaryField(blank=True, null=True)),
+                ('takeout_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TelegramEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entity_id', models.BigIntegerField()),
+                ('access_hash', models.BigIntegerField()),
+                ('username', models.CharField(blank=True, max_length=100, null=True)),
+                ('phone', models.CharField(blank=True, max_length=32, null=True)),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='app.telegramaccount')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'entity_id'), name='unique_entity_per_account')],
+            },
+        ),
+    ]
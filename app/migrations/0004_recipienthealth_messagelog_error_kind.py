@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_telegramsession_telegramentity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagelog',
+            name='error_kind',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecipientHealth',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recipient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='health', serialize=False, to='app.recipient')),
+                ('sent_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('consecutive_permanent_failures', models.IntegerField(default=0)),
+                ('deliverability', models.FloatField(default=1.0, help_text='Exponentially weighted share of successful sends')),
+                ('last_error_kind', models.CharField(blank=True, max_length=20, null=True)),
+                ('last_error_text', models.TextField(blank=True, null=True)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_recipienthealth_messagelog_error_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipient',
+            name='attributes',
+            field=models.JSONField(blank=True, default=dict, help_text='Custom values for {{ placeholders }} in message text'),
+        ),
+        migrations.AlterField(
+            model_name='scheduledmessage',
+            name='text',
+            field=models.TextField(help_text='Supports {{ name }}, {{ username }} and recipient attributes, with defaults: {{ city|there }}'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_accounthealth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('state', models.CharField(choices=[('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('STALE', 'Stale')], max_length=20)),
+                ('token', models.CharField(help_text='Owner of the reservation', max_length=32)),
+                ('reserved_at', models.DateTimeField()),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='app.scheduledmessage')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.recipient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'reserved_at'], name='reservation_state_idx')],
+                'constraints': [models.UniqueConstraint(fields=('message', 'recipient'), name='unique_delivery_per_recipient')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_deliveryreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('status', models.CharField(max_length=20)),
+                ('error_kind', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='app.telegramaccount')),
+            ],
+            options={
+                'ordering': ['-bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket_start', 'account', 'status', 'error_kind'), name='unique_rollup_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MessageLogArchive',
+            fields=[
+                ('original_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('message_id', models.BigIntegerField(db_index=True)),
+                ('recipient_id', models.BigIntegerField(null=True)),
+                ('status', models.CharField(max_length=20)),
+                ('error_kind', models.CharField(blank=True, max_length=20, null=True)),
+                ('error_text', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
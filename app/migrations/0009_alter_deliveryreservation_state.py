@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_deliveryrollup_rollupstate_messagelogarchive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deliveryreservation',
+            name='state',
+            field=models.CharField(choices=[('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('RELEASED', 'Released'), ('STALE', 'Stale')], max_length=20),
+        ),
+    ]
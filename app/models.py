@@ -1,5 +1,5 @@
 import os
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 
@@ -32,13 +32,132 @@ class TelegramAccount(BaseModel):
     def __str__(self):
         return f"{self.name} ({self.phone})"
 
+class AccountHealth(BaseModel):
+    """Cached account state written by the health probe and the send path (see app.account_health)."""
+    account = models.OneToOneField(TelegramAccount, on_delete=models.CASCADE, primary_key=True, related_name='health')
+    is_authorized = models.BooleanField(blank=True, null=True)
+    flood_wait_until = models.DateTimeField(blank=True, null=True)
+    last_success_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    checked_at = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def is_fresh(self):
+        return bool(self.checked_at) and (
+            timezone.now() - self.checked_at
+        ).total_seconds() < settings.ACCOUNT_HEALTH_TTL
+
+    def __str__(self):
+        return f"Health of account {self.account_id}"
+
+class TelegramSession(BaseModel):
+    """Telethon session state (see app.telegram_sessions.DatabaseSession)."""
+    account = models.OneToOneField(
+        TelegramAccount, on_delete=models.CASCADE, primary_key=True, related_name='telegram_session'
+    )
+    dc_id = models.IntegerField(default=0)
+    server_address = models.CharField(max_length=255, blank=True, null=True)
+    port = models.IntegerField(blank=True, null=True)
+    auth_key = models.BinaryField(blank=True, null=True)
+    takeout_id = models.BigIntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Session of {self.account_id} (DC {self.dc_id})"
+
+class TelegramEntity(BaseModel):
+    """Entity cache (access hashes) of a Telethon session."""
+    account = models.ForeignKey(TelegramAccount, on_delete=models.CASCADE, related_name='entities')
+    entity_id = models.BigIntegerField()
+    access_hash = models.BigIntegerField()
+    username = models.CharField(max_length=100, blank=True, null=True)
+    phone = models.CharField(max_length=32, blank=True, null=True)
+    name = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'entity_id'], name='unique_entity_per_account'),
+        ]
+
+    def __str__(self):
+        return f"{self.username or self.phone or self.entity_id} ({self.account_id})"
+
 class Recipient(BaseModel):
     name = models.CharField(max_length=100, blank=True)
     username = models.CharField(max_length=100, unique=True, help_text="Username (with @) or Phone number")
+    attributes = models.JSONField(
+        default=dict, blank=True, help_text="Custom values for {{ placeholders }} in message text"
+    )
     
     def __str__(self):
         return self.name or self.username
 
+class RecipientHealth(BaseModel):
+    """Delivery track record of a recipient, maintained by app.recipient_health."""
+    recipient = models.OneToOneField(Recipient, on_delete=models.CASCADE, primary_key=True, related_name='health')
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    consecutive_permanent_failures = models.IntegerField(default=0)
+    deliverability = models.FloatField(default=1.0, help_text="Exponentially weighted share of successful sends")
+    last_error_kind = models.CharField(max_length=20, blank=True, null=True)
+    last_error_text = models.TextField(blank=True, null=True)
+    last_success_at = models.DateTimeField(blank=True, null=True)
+    last_failure_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Health of {self.recipient_id}: {self.deliverability:.2f}"
+
+class ScheduledMessageQuerySet(models.QuerySet):
+    def cancel(self):
+        """
+        Cancels every not yet finished message in one UPDATE and revokes their queued tasks in bulk.
+        Running tasks notice the status change on their next status check.
+        """
+        from app.dispatch import cancel_queued
+
+        with transaction.atomic():
+            targets = self.filter(status__in=['PENDING', 'SCHEDULED', 'PARTIAL', 'FAILED']).select_for_update()
+            rows = list(targets.values_list('id', 'celery_task_id'))
+            updated = targets.update(status='CANCELLED', celery_task_id=None, updated_at=timezone.now())
+        cancel_queued(rows)
+        return updated
+
+    def reschedule(self, scheduled_at):
+        """Moves messages to a new time: old tasks are revoked, new ones queued, rows updated in one query."""
+        return self._requeue(scheduled_at, eta=scheduled_at)
+
+    def send_now(self):
+        return self._requeue(timezone.now(), eta=None)
+
+    def resume(self, eta=None):
+        """Queues interrupted messages again (immediately unless `eta` is given), keeping their scheduled time."""
+        return self._requeue(None, eta=eta)
+
+    def _requeue(self, scheduled_at, eta):
+        from app.dispatch import enqueue_messages, revoke_tasks
+
+        with transaction.atomic():
+            rows = list(self.exclude(status='SENT').select_for_update().values_list('id', 'celery_task_id'))
+            if not rows:
+                return 0
+            old_task_ids = [task_id for _, task_id in rows]
+            new_task_ids = enqueue_messages([message_id for message_id, _ in rows], eta=eta)
+            now = timezone.now()
+            fields = ['status', 'celery_task_id', 'updated_at']
+            if scheduled_at is not None:
+                fields.append('scheduled_at')
+            self.model.objects.bulk_update(
+                [
+                    self.model(
+                        id=message_id, scheduled_at=scheduled_at, status='SCHEDULED',
+                        celery_task_id=task_id, updated_at=now,
+                    )
+                    for message_id, task_id in new_task_ids.items()
+                ],
+                fields,
+            )
+        revoke_tasks(old_task_ids)
+        return len(rows)
+
 class ScheduledMessage(BaseModel):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -51,13 +170,17 @@ class ScheduledMessage(BaseModel):
 
     account = models.ForeignKey(TelegramAccount, on_delete=models.CASCADE)
     recipients = models.ManyToManyField(Recipient, related_name='messages')
-    text = models.TextField()
+    text = models.TextField(
+        help_text="Supports {{ name }}, {{ username }} and recipient attributes, with defaults: {{ city|there }}"
+    )
     media_path = models.CharField(max_length=255, blank=True, null=True, help_text="Path to file in /data/")
     scheduled_at = models.DateTimeField(db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     celery_task_id = models.CharField(max_length=255, blank=True, null=True)
     retry_count = models.IntegerField(default=0)
 
+    objects = ScheduledMessageQuerySet.as_manager()
+
     def __str__(self):
         return f"Msg to {self.recipients.count()} users at {self.scheduled_at}"
 
@@ -65,12 +188,100 @@ class MessageLog(BaseModel):
     message = models.ForeignKey(ScheduledMessage, on_delete=models.CASCADE, related_name='logs')
     recipient = models.ForeignKey(Recipient, on_delete=models.SET_NULL, null=True)
     status = models.CharField(max_length=20)
+    error_kind = models.CharField(max_length=20, blank=True, null=True)
     error_text = models.TextField(blank=True, null=True)
 
     def __str__(self):
         return f"Log: {self.status} for {self.recipient}"
     
 
+class DeliveryReservation(BaseModel):
+    """
+    Idempotency key for one (message, recipient) send, taken before the network call.
+    The unique constraint makes the reservation atomic across workers (see app.idempotency).
+    """
+    STATE_CHOICES = [
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+        ('RELEASED', 'Released'),
+        ('STALE', 'Stale'),
+    ]
+
+    message = models.ForeignKey(ScheduledMessage, on_delete=models.CASCADE, related_name='reservations')
+    recipient = models.ForeignKey(Recipient, on_delete=models.CASCADE)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES)
+    token = models.CharField(max_length=32, help_text="Owner of the reservation")
+    reserved_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'recipient'], name='unique_delivery_per_recipient'),
+        ]
+        indexes = [
+            models.Index(fields=['state', 'reserved_at'], name='reservation_state_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.state}: message {self.message_id} to {self.recipient_id}"
+
+class DeliveryRollup(BaseModel):
+    """
+    MessageLog counts pre-aggregated per hour or day, account, status and error kind.
+    Filled incrementally by the rollup_message_logs task (see app.rollups); reports read these rows only.
+    """
+    PERIOD_CHOICES = [
+        ('HOUR', 'Hour'),
+        ('DAY', 'Day'),
+    ]
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    account = models.ForeignKey(TelegramAccount, on_delete=models.CASCADE, related_name='rollups')
+    status = models.CharField(max_length=20)
+    # Empty string instead of NULL, NULLs would never collide in the unique constraint
+    error_kind = models.CharField(max_length=20, blank=True, default='')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'bucket_start', 'account', 'status', 'error_kind'], name='unique_rollup_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:%M} {self.status}: {self.count}"
+
+class RollupState(BaseModel):
+    """High-water mark of a rollup: every MessageLog with id <= last_id has been counted."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} up to #{self.last_id}"
+
+class MessageLogArchive(models.Model):
+    """
+    Cold copy of MessageLog rows older than MESSAGE_LOG_RETENTION_DAYS.
+    Plain ids instead of foreign keys so archived rows never slow down deletes of hot tables.
+    """
+    original_id = models.BigIntegerField(primary_key=True)
+    message_id = models.BigIntegerField(db_index=True)
+    recipient_id = models.BigIntegerField(null=True)
+    status = models.CharField(max_length=20)
+    error_kind = models.CharField(max_length=20, blank=True, null=True)
+    error_text = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Archived log #{self.original_id}: {self.status}"
+
 class LogEntry(BaseModel):
     level = models.CharField(max_length=10)
     module = models.CharField(max_length=100)
@@ -82,4 +293,24 @@ class LogEntry(BaseModel):
         verbose_name_plural = 'Log entries'
 
     def __str__(self):
-        return f"[{self.created_at.strftime('%Y-%m-%d %H:%M:%S')}] [{self.level}] {self.module}"
\ No newline at end of file
+        return f"[{self.created_at.strftime('%Y-%m-%d %H:%M:%S')}] [{self.level}] {self.module}"
+
+class TaskProfile(BaseModel):
+    task_name = models.CharField(max_length=100, db_index=True)
+    task_id = models.CharField(max_length=255, blank=True, null=True)
+    duration_ms = models.FloatField()
+    db_time_ms = models.FloatField()
+    network_time_ms = models.FloatField()
+    python_time_ms = models.FloatField()
+    query_count = models.IntegerField()
+    duplicate_query_count = models.IntegerField(help_text="Queries repeating an already executed SQL statement")
+    duplicate_queries = models.JSONField(default=list, blank=True)
+    slowest_query = models.TextField(blank=True)
+    slowest_query_ms = models.FloatField(default=0)
+    profile_file = models.CharField(max_length=255, blank=True, null=True, help_text="cProfile dump in /data/profiles/")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.task_name} ({self.duration_ms:.0f} ms, {self.query_count} queries)"
\ No newline at end of file
@@ -0,0 +1,152 @@
+import cProfile
+import logging
+import os
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_current_profiler = ContextVar('task_profiler', default=None)
+
+class TaskProfiler:
+    """
+    Collects query statistics and a DB / network / Python time split for a single task run.
+    """
+    def __init__(self, task_name, task_id=None):
+        self.task_name = task_name
+        self.task_id = task_id
+        self.query_count = 0
+        self.db_time = 0.0
+        self.network_time = 0.0
+        self.slowest_query = ''
+        self.slowest_query_time = 0.0
+        # Units of work (e.g. recipients) the task processed, reported through count_items()
+        self.items = 0
+        self._statements = Counter()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.db_time += elapsed
+            # Parameters are not part of the SQL, so an N+1 loop shows up as one repeated statement
+            self._statements[sql] += 1
+            if elapsed > self.slowest_query_time:
+                self.slowest_query_time = elapsed
+                self.slowest_query = sql
+
+    @property
+    def duplicate_query_count(self):
+        return sum(count - 1 for count in self._statements.values() if count > 1)
+
+    def suspicious_selects(self):
+        """
+        SELECTs repeated more often than the work explains. Per-item INSERTs/UPDATEs and periodic
+        checks are expected; a lookup run once per item (the classic N+1) is not.
+        """
+        limit = max(
+            settings.TASK_PROFILING_DUPLICATE_THRESHOLD,
+            self.items * settings.TASK_PROFILING_DUPLICATES_PER_ITEM,
+        )
+        return [
+            (sql, count) for sql, count in self._statements.most_common()
+            if count > limit and sql.lstrip()[:6].upper() == 'SELECT'
+        ]
+
+    def top_duplicates(self, limit=5):
+        return [
+            {'sql': sql[:500], 'count': count}
+            for sql, count in self._statements.most_common(limit)
+            if count > 1
+        ]
+
+@contextmanager
+def track_network():
+    """Attributes the wrapped block to network time of the active profiler, if any."""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.network_time += time.perf_counter() - start
+
+def count_items(count):
+    """Tells the active profiler, if any, how many units of work the task handles."""
+    profiler = _current_profiler.get()
+    if profiler is not None:
+        profiler.items += count
+
+@contextmanager
+def profile_task(task_name, task_id=None):
+    if not settings.TASK_PROFILING_ENABLED:
+        yield None
+        return
+
+    profiler = TaskProfiler(task_name, task_id)
+    token = _current_profiler.set(profiler)
+    sampler = cProfile.Profile() if random.random() < settings.TASK_PROFILING_SAMPLE_RATE else None
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(profiler.execute_wrapper):
+            if sampler:
+                sampler.enable()
+            try:
+                yield profiler
+            finally:
+                if sampler:
+                    sampler.disable()
+    finally:
+        duration = time.perf_counter() - start
+        _current_profiler.reset(token)
+        _save_profile(profiler, duration, sampler)
+
+def _save_profile(profiler, duration, sampler):
+    from app.models import TaskProfile
+
+    profile_file = None
+    try:
+        if sampler:
+            os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+            profile_file = os.path.join(
+                settings.PROFILES_DIR,
+                f"{profiler.task_name}_{profiler.task_id or int(time.time())}.prof",
+            )
+            sampler.dump_stats(profile_file)
+
+        duplicates = profiler.duplicate_query_count
+        TaskProfile.objects.create(
+            task_name=profiler.task_name,
+            task_id=profiler.task_id,
+            duration_ms=duration * 1000,
+            db_time_ms=profiler.db_time * 1000,
+            network_time_ms=profiler.network_time * 1000,
+            python_time_ms=max(duration - profiler.db_time - profiler.network_time, 0) * 1000,
+            query_count=profiler.query_count,
+            duplicate_query_count=duplicates,
+            duplicate_queries=profiler.top_duplicates(),
+            slowest_query=profiler.slowest_query,
+            slowest_query_ms=profiler.slowest_query_time * 1000,
+            profile_file=profile_file,
+        )
+
+        suspicious = profiler.suspicious_selects()
+        if suspicious:
+            sql, count = suspicious[0]
+            logger.warning(
+                f"Possible N+1 in {profiler.task_name} ({profiler.task_id}): "
+                f"a SELECT ran {count} times for {profiler.items} items: {sql[:200]}"
+            )
+    except Exception as e:
+        logger.error(f"Failed to store profile for {profiler.task_name}: {e}")
@@ -0,0 +1,90 @@
+import logging
+import time
+from channels.layers import get_channel_layer
+from django.conf import settings
+from app.models import MessageLog
+
+logger = logging.getLogger(__name__)
+
+def progress_group(message_id):
+    return f"message_progress_{message_id}"
+
+def delivery_states(message_id):
+    """Latest outcome per recipient: 'SENT' once sent at all, otherwise its last FAILED or SKIPPED log."""
+    states = {}
+    logs = MessageLog.objects.filter(message_id=message_id, recipient__isnull=False).order_by('id')
+    for recipient_id, status in logs.values_list('recipient_id', 'status'):
+        if states.get(recipient_id) != 'SENT':
+            states[recipient_id] = status
+    return states
+
+def progress_counts(recipient_count, states):
+    """(total, sent, failed) as shown on the progress page; skipped recipients are not part of the total."""
+    outcomes = list(states.values())
+    return recipient_count - outcomes.count('SKIPPED'), outcomes.count('SENT'), outcomes.count('FAILED')
+
+class ProgressPublisher:
+    """
+    Tracks delivery counters of one ScheduledMessage and pushes them to its Channels group.
+    Updates are coalesced to PROGRESS_MAX_UPDATES_PER_SECOND unless forced.
+    Start it from progress_counts() so pushed counters match the page's initial snapshot.
+    """
+    def __init__(self, message_id, total, sent=0, failed=0):
+        self.message_id = message_id
+        self.total = total
+        self.sent = sent
+        self.failed = failed
+        self._processed = 0
+        self._started = time.monotonic()
+        self._last_published = 0.0
+        self._min_interval = 1 / settings.PROGRESS_MAX_UPDATES_PER_SECOND
+        self._channel_layer = get_channel_layer()
+
+    @property
+    def remaining(self):
+        return max(self.total - self.sent - self.failed, 0)
+
+    async def record(self, status, previous=None):
+        """Counts one attempt; `previous` is the recipient's state from delivery_states()."""
+        if previous == 'FAILED':
+            # Already counted as failed: a retry can only move it to sent
+            if status == 'SENT':
+                self.failed -= 1
+                self.sent += 1
+        else:
+            if previous == 'SKIPPED':
+                self.total += 1
+            if status == 'SENT':
+                self.sent += 1
+            else:
+                self.failed += 1
+        self._processed += 1
+        await self.publish()
+
+    async def publish(self, force=False):
+        if self._channel_layer is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_published < self._min_interval:
+            return
+        self._last_published = now
+
+        elapsed = now - self._started
+        rate = self._processed / elapsed if elapsed > 0 else 0.0
+        payload = {
+            'type': 'progress.update',
+            'message_id': self.message_id,
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'remaining': self.remaining,
+            'rate': round(rate, 2),
+            'eta_seconds': round(self.remaining / rate) if rate else None,
+            'final': self.remaining == 0,
+        }
+        try:
+            await self._channel_layer.group_send(progress_group(self.message_id), payload)
+        except Exception as e:
+            # Progress is best-effort and must never interrupt sending
+            logger.warning(f"Failed to publish progress for message {self.message_id}: {e}")
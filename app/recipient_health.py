@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.utils import timezone
+from app.delivery_errors import PERMANENT
+from app.models import MessageLog, RecipientHealth
+
+# Weight of the latest outcome in the deliverability score
+SCORE_ALPHA = 0.3
+
+def load_deliverable_recipients(msg_obj):
+    """
+    Returns the recipients worth sending to. Recipients with too many consecutive
+    permanent failures are skipped and get a single SKIPPED log per message.
+    """
+    limit = settings.RECIPIENT_PERMANENT_FAILURE_LIMIT
+    deliverable, skipped = [], []
+    for recipient in msg_obj.recipients.select_related('health'):
+        health = getattr(recipient, 'health', None)
+        if health and health.consecutive_permanent_failures >= limit:
+            skipped.append(recipient)
+        else:
+            deliverable.append(recipient)
+
+    if skipped:
+        logged = set(
+            MessageLog.objects
+            .filter(message=msg_obj, status='SKIPPED')
+            .values_list('recipient_id', flat=True)
+        )
+        MessageLog.objects.bulk_create([
+            MessageLog(
+                message=msg_obj,
+                recipient=recipient,
+                status='SKIPPED',
+                error_kind=PERMANENT,
+                error_text=recipient.health.last_error_text,
+            )
+            for recipient in skipped
+            if recipient.id not in logged
+        ])
+    return deliverable
+
+def record_outcomes(outcomes):
+    """
+    Folds (recipient_id, error_kind, error_text) tuples into RecipientHealth with two queries.
+    error_kind is None for a successful send.
+    """
+    if not outcomes:
+        return
+
+    now = timezone.now()
+    records = {
+        health.recipient_id: health
+        for health in RecipientHealth.objects.filter(recipient_id__in={outcome[0] for outcome in outcomes})
+    }
+    for recipient_id, error_kind, error_text in outcomes:
+        health = records.setdefault(recipient_id, RecipientHealth(recipient_id=recipient_id))
+        if error_kind is None:
+            health.sent_count += 1
+            health.consecutive_permanent_failures = 0
+            health.deliverability = health.deliverability * (1 - SCORE_ALPHA) + SCORE_ALPHA
+            health.last_success_at = now
+        else:
+            health.failed_count += 1
+            if error_kind == PERMANENT:
+                health.consecutive_permanent_failures += 1
+            health.deliverability = health.deliverability * (1 - SCORE_ALPHA)
+            health.last_error_kind = error_kind
+            health.last_error_text = error_text
+            health.last_failure_at = now
+
+    RecipientHealth.objects.bulk_create(
+        records.values(),
+        update_conflicts=True,
+        unique_fields=['recipient'],
+        update_fields=[
+            'sent_count', 'failed_count', 'consecutive_permanent_failures', 'deliverability',
+            'last_error_kind', 'last_error_text', 'last_success_at', 'last_failure_at', 'updated_at',
+        ],
+    )
\ No newline at end of file
@@ -0,0 +1,134 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from app.models import DeliveryRollup, MessageLog, MessageLogArchive, RollupState
+
+STATE_NAME = 'message_log'
+
+PERIODS = {
+    'HOUR': TruncHour,
+    'DAY': TruncDay,
+}
+
+def rollup_message_logs(batch_size=None):
+    """
+    Folds MessageLog rows above the high-water mark into DeliveryRollup, one batch per transaction.
+    Only rows older than ROLLUP_SETTLE_SECONDS can advance the mark, so an insert that commits
+    shortly after a higher id is not skipped. Returns the number of log rows counted.
+    """
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    RollupState.objects.get_or_create(name=STATE_NAME)
+    total = 0
+
+    while True:
+        with transaction.atomic():
+            # The row lock serializes concurrent runs; the mark and the counts commit together
+            state = RollupState.objects.select_for_update().get(name=STATE_NAME)
+            upper_id = _batch_upper_id(state.last_id, batch_size)
+            if upper_id is None:
+                return total
+
+            new_logs = MessageLog.objects.filter(id__gt=state.last_id, id__lte=upper_id)
+            for period, trunc in PERIODS.items():
+                counted = _apply_counts(period, _count(new_logs, trunc))
+
+            state.last_id = upper_id
+            state.save(update_fields=['last_id', 'updated_at'])
+        total += counted
+
+def archive_message_logs(batch_size=None):
+    """
+    Moves MessageLog rows older than MESSAGE_LOG_RETENTION_DAYS into MessageLogArchive.
+    Rows not yet counted by the rollup stay put. Returns the number of rows moved.
+    """
+    if not settings.MESSAGE_LOG_RETENTION_DAYS:
+        return 0
+
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=settings.MESSAGE_LOG_RETENTION_DAYS)
+    state = RollupState.objects.filter(name=STATE_NAME).first()
+    if state is None:
+        return 0
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            logs = (
+                MessageLog.objects
+                .filter(id__lte=state.last_id, created_at__lt=cutoff)
+                .order_by('id')
+                .values('id', 'message_id', 'recipient_id', 'status', 'error_kind', 'error_text', 'created_at')
+            )
+            logs = list(logs[:batch_size])
+            if not logs:
+                return moved
+
+            MessageLogArchive.objects.bulk_create(
+                [
+                    MessageLogArchive(
+                        original_id=log['id'], message_id=log['message_id'], recipient_id=log['recipient_id'],
+                        status=log['status'], error_kind=log['error_kind'], error_text=log['error_text'],
+                        created_at=log['created_at'],
+                    )
+                    for log in logs
+                ],
+                ignore_conflicts=True,
+            )
+            MessageLog.objects.filter(id__in=[log['id'] for log in logs]).delete()
+        moved += len(logs)
+
+def _batch_upper_id(last_id, batch_size):
+    settled = MessageLog.objects.filter(
+        id__gt=last_id,
+        created_at__lte=timezone.now() - timedelta(seconds=settings.ROLLUP_SETTLE_SECONDS),
+    ).order_by('id').values_list('id', flat=True)
+    ids = list(settled[batch_size - 1:batch_size])
+    if ids:
+        return ids[0]
+    return settled.order_by('-id').first()
+
+def _count(logs, trunc):
+    return (
+        logs
+        .annotate(bucket_start=trunc('created_at'), account_id=F('message__account_id'))
+        .values('bucket_start', 'account_id', 'status', 'error_kind')
+        .annotate(count=Count('id'))
+    )
+
+def _apply_counts(period, rows):
+    """Adds aggregated counts to existing buckets and creates the missing ones; returns the rows counted."""
+    increments = {}
+    for row in rows:
+        key = (row['bucket_start'], row['account_id'], row['status'], row['error_kind'] or '')
+        increments[key] = increments.get(key, 0) + row['count']
+    if not increments:
+        return 0
+    counted = sum(increments.values())
+
+    existing = DeliveryRollup.objects.select_for_update().filter(
+        period=period,
+        bucket_start__gte=min(key[0] for key in increments),
+        bucket_start__lte=max(key[0] for key in increments),
+        account_id__in={key[1] for key in increments},
+    )
+    now = timezone.now()
+    to_update = []
+    for rollup in existing:
+        increment = increments.pop((rollup.bucket_start, rollup.account_id, rollup.status, rollup.error_kind), 0)
+        if increment:
+            rollup.count += increment
+            rollup.updated_at = now
+            to_update.append(rollup)
+
+    DeliveryRollup.objects.bulk_update(to_update, ['count', 'updated_at'])
+    DeliveryRollup.objects.bulk_create([
+        DeliveryRollup(
+            period=period, bucket_start=bucket_start, account_id=account_id,
+            status=status, error_kind=error_kind, count=count,
+        )
+        for (bucket_start, account_id, status, error_kind), count in increments.items()
+    ])
+    return counted
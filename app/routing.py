@@ -0,0 +1,6 @@
+from django.urls import path
+from app.consumers import MessageProgressConsumer
+
+websocket_urlpatterns = [
+    path('ws/messages/<int:message_id>/progress/', MessageProgressConsumer.as_asgi()),
+]
\ No newline at end of file
@@ -0,0 +1,48 @@
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+# Message ids waiting to be sent, scored by due timestamp
+DUE_KEY = 'send_queue:due'
+# Message ids claimed by a send worker, scored by last heartbeat
+PROCESSING_KEY = 'send_queue:processing'
+
+# Moves up to ARGV[2] ids due at ARGV[1] from KEYS[1] into KEYS[2], so concurrent workers never share one
+CLAIM_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[1], id)
+end
+return ids
+"""
+
+# Returns ids whose heartbeat is older than ARGV[1] (crashed worker) from KEYS[1] back to KEYS[2]
+RECOVER_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[2], id)
+end
+return #ids
+"""
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.SEND_QUEUE_REDIS_URL)
+    return _client
+
+def push(message_ids, due_at=None):
+    """Adds or moves messages in the due set; re-pushing a message simply updates its time."""
+    score = (due_at or timezone.now()).timestamp()
+    mapping = {str(message_id): score for message_id in message_ids}
+    if mapping:
+        get_client().zadd(DUE_KEY, mapping)
+
+def remove(message_ids):
+    message_ids = [str(message_id) for message_id in message_ids]
+    if message_ids:
+        get_client().zrem(DUE_KEY, *message_ids)
\ No newline at end of file
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import signal
+import time
+from contextlib import suppress
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from redis import asyncio as aioredis
+from telethon import errors
+
+from app import send_queue
+from app.account_health import ensure_account_usable
+from app.delivery_errors import AccountCoolingDownError, AccountUnavailableError
+from app.models import ScheduledMessage
+from app.recipient_health import load_deliverable_recipients
+from app.sending import deliver_message, is_current_task
+from app.telegram_utils import ClientPool
+
+logger = logging.getLogger(__name__)
+
+class SendWorker:
+    """
+    Single-process asyncio alternative to prefork Celery sending.
+    Claims due message ids from the Redis queue and keeps up to `concurrency` messages
+    in flight on one event loop, sharing one connected client per account.
+    """
+    def __init__(self, concurrency=None, poll_interval=1.0, visibility_timeout=300):
+        self.concurrency = concurrency or settings.SEND_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.pool = ClientPool()
+        self._in_flight = {}
+        self._stopping = None
+        self._redis = None
+
+    def stop(self):
+        logger.info("Send worker stopping...")
+        self._stopping.set()
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        self._redis = aioredis.Redis.from_url(settings.SEND_QUEUE_REDIS_URL)
+        claim = self._redis.register_script(send_queue.CLAIM_SCRIPT)
+        recover = self._redis.register_script(send_queue.RECOVER_SCRIPT)
+        logger.info(f"Send worker started with concurrency {self.concurrency}.")
+
+        try:
+            while not self._stopping.is_set():
+                await sync_to_async(close_old_connections)()
+                now = time.time()
+
+                if self._in_flight:
+                    # Heartbeat: refresh the claim of everything we are still working on
+                    await self._redis.zadd(
+                        send_queue.PROCESSING_KEY,
+                        {str(message_id): now for message_id in self._in_flight},
+                        xx=True,
+                    )
+                recovered = await recover(
+                    keys=[send_queue.PROCESSING_KEY, send_queue.DUE_KEY],
+                    args=[now - self.visibility_timeout, now],
+                )
+                if recovered:
+                    logger.warning(f"Recovered {recovered} messages abandoned by a stopped worker.")
+
+                free_slots = self.concurrency - len(self._in_flight)
+                if free_slots > 0:
+                    message_ids = await claim(
+                        keys=[send_queue.DUE_KEY, send_queue.PROCESSING_KEY],
+                        args=[now, free_slots],
+                    )
+                    busy = {}
+                    for raw_id in message_ids:
+                        message_id = int(raw_id)
+                        if message_id in self._in_flight:
+                            # Re-queued while still sending: keep it due until the running handler is done
+                            busy[raw_id] = now
+                        else:
+                            self._spawn(message_id)
+                    if busy:
+                        await self._redis.zadd(send_queue.DUE_KEY, busy)
+
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+        finally:
+            for task in self._in_flight.values():
+                task.cancel()
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+            await self.pool.close()
+            await self._redis.aclose()
+            logger.info("Send worker stopped.")
+
+    def _spawn(self, message_id):
+        task = asyncio.create_task(self._handle(message_id))
+        self._in_flight[message_id] = task
+        task.add_done_callback(lambda _: self._forget(message_id, task))
+
+    def _forget(self, message_id, task):
+        if self._in_flight.get(message_id) is task:
+            del self._in_flight[message_id]
+
+    async def _handle(self, message_id):
+        try:
+            msg_obj, recipients = await sync_to_async(_start_message)(message_id)
+            if msg_obj is None:
+                return
+
+            await sync_to_async(ensure_account_usable)(msg_obj.account_id)
+            async with self.pool.acquire(msg_obj.account) as wrapper:
+                # The claim token stored at queue time; a reschedule replaces it and stops this run
+                completed = await deliver_message(msg_obj, recipients, wrapper, task_id=msg_obj.celery_task_id)
+            if completed:
+                await sync_to_async(_finish_message)(message_id)
+
+        except errors.FloodWaitError as e:
+            logger.warning(f"FloodWait hit for message {message_id}. Retrying in {e.seconds} seconds.")
+            await self._requeue(message_id, e.seconds + 5)
+        except AccountCoolingDownError as e:
+            logger.info(f"Message {message_id} postponed: {e}")
+            await self._requeue(message_id, e.seconds)
+        except AccountUnavailableError as e:
+            logger.error(f"Sending message {message_id} aborted: {e}")
+            await sync_to_async(_fail_message)(message_id)
+        except asyncio.CancelledError:
+            # Shutdown: hand the message back, already sent recipients are skipped on resume
+            await self._requeue(message_id, 0)
+            raise
+        except Exception as e:
+            logger.error(f"Sending message {message_id} failed: {e}")
+            retries = await sync_to_async(_fail_message)(message_id)
+            if retries <= settings.SEND_WORKER_MAX_RETRIES:
+                await self._requeue(message_id, 60 * (2 ** (retries - 1)))
+        finally:
+            await self._redis.zrem(send_queue.PROCESSING_KEY, str(message_id))
+
+    async def _requeue(self, message_id, delay):
+        await self._redis.zadd(send_queue.DUE_KEY, {str(message_id): time.time() + delay})
+
+def _start_message(message_id):
+    msg_obj = ScheduledMessage.objects.select_related('account').filter(id=message_id).first()
+    if msg_obj is None or not is_current_task(msg_obj.status, None, None):
+        return None, []
+
+    # Mark as processing
+    if msg_obj.status != 'PARTIAL':
+        msg_obj.status = 'PARTIAL'
+        msg_obj.save(update_fields=['status'])
+    return msg_obj, load_deliverable_recipients(msg_obj)
+
+def _finish_message(message_id):
+    ScheduledMessage.objects.filter(id=message_id, status='PARTIAL').update(status='SENT')
+
+def _fail_message(message_id):
+    ScheduledMessage.objects.filter(id=message_id).update(retry_count=F('retry_count') + 1)
+    ScheduledMessage.objects.filter(id=message_id, status='PARTIAL').update(status='FAILED')
+    return ScheduledMessage.objects.filter(id=message_id).values_list('retry_count', flat=True).first() or 0
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from telethon import errors
+
+from app import account_health
+from app.delivery_errors import ACCOUNT, AUTH_ERRORS, AccountUnavailableError, classify_error
+from app.idempotency import complete, new_token, release, reserve, unfinished_recipients
+from app.metrics import FLOOD_WAIT_SECONDS, QUEUE_LAG, SEND_ATTEMPTS, SEND_LATENCY
+from app.models import ScheduledMessage
+from app.profiling import count_items
+from app.progress import ProgressPublisher, delivery_states, progress_counts
+from app.recipient_health import record_outcomes
+from app.templating import compile_template
+
+logger = logging.getLogger(__name__)
+
+# Recipients sent between two cheap status re-checks of a running message
+STATUS_CHECK_INTERVAL = 25
+
+async def deliver_message(msg_obj, recipients, wrapper, task_id=None):
+    """
+    Sends msg_obj to every recipient not yet served through an already connected wrapper.
+    Shared by the Celery task and the asyncio send worker; ORM calls are offloaded
+    with sync_to_async so the event loop is never blocked by the database.
+    Returns False if the message was cancelled or re-queued while sending. A message with
+    recipients left without an outcome (held or released by another worker) is re-queued
+    after SEND_RESERVATION_RETRY_DELAY instead of being finished.
+    FloodWaitError is propagated so the caller can reschedule; an account-level
+    error aborts the batch with AccountUnavailableError.
+    Every send is preceded by a DeliveryReservation so two workers never deliver the
+    same (message, recipient) pair.
+    """
+    account_label = str(msg_obj.account_id)
+    count_items(len(recipients))
+    # One query instead of an exists() per recipient; also seeds the same counters the progress page shows
+    states = await sync_to_async(delivery_states)(msg_obj.id)
+    recipient_count = await sync_to_async(msg_obj.recipients.count)()
+    progress = ProgressPublisher(msg_obj.id, *progress_counts(recipient_count, states))
+    # (recipient_id, error_kind, error_text) collected for RecipientHealth, flushed in batches
+    outcomes = []
+    # Recipients this run is responsible for; the message is done once each has a SENT/FAILED outcome
+    attempted = []
+    sent_any = False
+    token = new_token()
+    # Compiled (and markdown-parsed) once per distinct text, rendered for the whole batch in one pass
+    rendered = compile_template(msg_obj.text).render_many(recipients)
+
+    try:
+        for index, (recipient, (text, entities)) in enumerate(zip(recipients, rendered)):
+            if index and index % STATUS_CHECK_INTERVAL == 0:
+                await sync_to_async(record_outcomes)(outcomes)
+                outcomes.clear()
+                if await sync_to_async(should_stop)(msg_obj.id, task_id):
+                    logger.info(f"Message {msg_obj.id} was cancelled or re-queued; stopping after {index} recipients.")
+                    return False
+
+            # Skip recipients already sent successfully to avoid duplicates on retry
+            previous = states.get(recipient.id)
+            if previous == 'SENT':
+                continue
+            attempted.append(recipient.id)
+            if not await sync_to_async(reserve)(msg_obj.id, recipient.id, token):
+                # Sent meanwhile or held by another worker; the final outcome check decides completion
+                continue
+
+            target = recipient.username # User ID or Username
+            started = time.monotonic()
+            try:
+                await wrapper.send_message(target, text, entities, file=msg_obj.media_path)
+                _observe_send(account_label, 'SENT', started)
+                QUEUE_LAG.observe((timezone.now() - msg_obj.scheduled_at).total_seconds())
+
+                await sync_to_async(complete)(msg_obj, recipient, token, 'SENT')
+                outcomes.append((recipient.id, None, None))
+                sent_any = True
+                await progress.record('SENT', previous)
+            except errors.FloodWaitError as e:
+                _observe_send(account_label, 'FLOOD_WAIT', started)
+                FLOOD_WAIT_SECONDS.labels(account=account_label).observe(e.seconds)
+                await sync_to_async(release)(msg_obj.id, recipient.id, token)
+                await sync_to_async(account_health.record_flood_wait)(msg_obj.account_id, e.seconds)
+                raise
+            except Exception as e:
+                error_kind = classify_error(e)
+                _observe_send(account_label, 'FAILED', started)
+                await sync_to_async(complete)(msg_obj, recipient, token, 'FAILED', str(e), error_kind)
+                await progress.record('FAILED', previous)
+                if error_kind == ACCOUNT:
+                    # Not the recipient's fault, and every further recipient would fail the same way
+                    await sync_to_async(account_health.record_account_error)(
+                        msg_obj.account_id, str(e), deauthorized=isinstance(e, AUTH_ERRORS)
+                    )
+                    raise AccountUnavailableError(f"Account {msg_obj.account_id} cannot send: {e}") from e
+                outcomes.append((recipient.id, error_kind, str(e)))
+                # We continue to next recipient, but log the error
+            except BaseException:
+                # Cancelled or shutting down mid-send: hand the recipient back to the next attempt
+                await asyncio.shield(sync_to_async(release)(msg_obj.id, recipient.id, token))
+                raise
+
+        unfinished = await sync_to_async(unfinished_recipients)(msg_obj.id, attempted)
+        if unfinished:
+            await sync_to_async(retry_later)(msg_obj.id)
+            logger.info(
+                f"Message {msg_obj.id} has {len(unfinished)} recipients without an outcome; "
+                f"re-queued in {settings.SEND_RESERVATION_RETRY_DELAY} seconds."
+            )
+            return False
+        return True
+    finally:
+        await sync_to_async(record_outcomes)(outcomes)
+        if sent_any:
+            await sync_to_async(account_health.record_success)(msg_obj.account_id)
+        await progress.publish(force=True)
+
+def is_current_task(status, celery_task_id, task_id):
+    if status in ('SENT', 'CANCELLED'):
+        return False
+    # A different stored id means the message was rescheduled and this task is stale
+    return not (celery_task_id and task_id and celery_task_id != task_id)
+
+def should_stop(message_id, task_id):
+    row = ScheduledMessage.objects.filter(id=message_id).values_list('status', 'celery_task_id').first()
+    return row is None or not is_current_task(*row, task_id)
+
+def retry_later(message_id):
+    eta = timezone.now() + timedelta(seconds=settings.SEND_RESERVATION_RETRY_DELAY)
+    ScheduledMessage.objects.filter(id=message_id, status='PARTIAL').resume(eta=eta)
+
+def _observe_send(account_label, status, started):
+    SEND_ATTEMPTS.labels(account=account_label, status=status).inc()
+    SEND_LATENCY.labels(account=account_label, status=status).observe(time.monotonic() - started)
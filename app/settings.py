@@ -65,6 +65,7 @@ LOGGING = {
 }
 
 WSGI_APPLICATION = 'app.wsgi.application'
+ASGI_APPLICATION = 'app.asgi.application'
 
 DATABASES = {
     'default': {
@@ -95,7 +96,79 @@ CELERY_TIMEZONE = 'UTC'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Periodic tasks are declared in app/celery.py so web processes never import celery.schedules
+BACKUP_SCHEDULE_HOUR = int(os.getenv('BACKUP_SCHEDULE_HOUR', '3'))
+ACCOUNT_HEALTH_PROBE_INTERVAL = int(os.getenv('ACCOUNT_HEALTH_PROBE_INTERVAL', '300'))
+STALE_RESERVATION_CHECK_INTERVAL = 300
+ROLLUP_INTERVAL = int(os.getenv('ROLLUP_INTERVAL', '300'))
+
+# Delivery analytics: MessageLog rows are folded into DeliveryRollup once they are ROLLUP_SETTLE_SECONDS old
+ROLLUP_SETTLE_SECONDS = 60
+ROLLUP_BATCH_SIZE = 10000
+# Raw logs older than this move to MessageLogArchive nightly; unset keeps them in MessageLog forever
+MESSAGE_LOG_RETENTION_DAYS = int(os.getenv('MESSAGE_LOG_RETENTION_DAYS', '0')) or None
+# Seconds a probe result is trusted for blocking sends; older results are shown but ignored
+ACCOUNT_HEALTH_TTL = int(os.getenv('ACCOUNT_HEALTH_TTL', '900'))
+
+# 'celery' sends through prefork Celery tasks, 'async_worker' through the run_send_worker command
+SEND_BACKEND = os.getenv('SEND_BACKEND', 'celery')
+SEND_QUEUE_REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+SEND_WORKER_CONCURRENCY = int(os.getenv('SEND_WORKER_CONCURRENCY', '200'))
+SEND_WORKER_MAX_RETRIES = 5
+# Consecutive permanent failures (deactivated, privacy restricted, invalid username...) before a recipient is skipped
+RECIPIENT_PERMANENT_FAILURE_LIMIT = int(os.getenv('RECIPIENT_PERMANENT_FAILURE_LIMIT', '2'))
+# Seconds after which a SENDING reservation is considered abandoned and may be taken over
+SEND_RESERVATION_TTL = int(os.getenv('SEND_RESERVATION_TTL', '600'))
+# Seconds before a message whose recipients were held by another worker is tried again
+SEND_RESERVATION_RETRY_DELAY = int(os.getenv('SEND_RESERVATION_RETRY_DELAY', '60'))
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [os.getenv('REDIS_URL', 'redis://redis:6379/0')],
+        },
+    },
+}
+# Upper bound of progress pushes per message; intermediate updates are coalesced
+PROGRESS_MAX_UPDATES_PER_SECOND = float(os.getenv('PROGRESS_MAX_UPDATES_PER_SECOND', '2'))
 
 GOOGLE_DRIVE_CREDENTIALS_JSON = os.getenv('GOOGLE_DRIVE_CREDENTIALS_JSON')
 GOOGLE_DRIVE_FOLDER_ID = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
-DB_BACKUP_FILENAME = 'telegram_scheduler_db.dump'
\ No newline at end of file
+DB_BACKUP_FILENAME = 'telegram_scheduler_db.dump'
+
+# Backup I/O throttling: CPU/IO priority of pg_dump, bandwidth (bytes/s) and write ops/s caps (0 = unlimited)
+BACKUP_NICE = int(os.getenv('BACKUP_NICE', '10'))
+BACKUP_IONICE_CLASS = int(os.getenv('BACKUP_IONICE_CLASS', '2'))
+BACKUP_IONICE_LEVEL = int(os.getenv('BACKUP_IONICE_LEVEL', '7'))
+BACKUP_BANDWIDTH_LIMIT = int(os.getenv('BACKUP_BANDWIDTH_LIMIT', str(20 * 1024 * 1024)))
+BACKUP_IOPS_LIMIT = int(os.getenv('BACKUP_IOPS_LIMIT', '200'))
+# Drive upload chunk (multiple of 256 KiB); each chunk is one throttled read
+BACKUP_UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Adaptive mode: slow down (x4) or pause backup I/O while due messages wait longer than these (seconds)
+BACKUP_ADAPTIVE = os.getenv('BACKUP_ADAPTIVE', 'True') == 'True'
+BACKUP_SLOWDOWN_QUEUE_LAG = int(os.getenv('BACKUP_SLOWDOWN_QUEUE_LAG', '30'))
+BACKUP_PAUSE_QUEUE_LAG = int(os.getenv('BACKUP_PAUSE_QUEUE_LAG', '120'))
+BACKUP_MAX_PAUSE = int(os.getenv('BACKUP_MAX_PAUSE', '900'))
+BACKUP_LAG_CHECK_INTERVAL = 5
+
+# Each process writes metrics into its own PROMETHEUS_MULTIPROC_DIR below this root;
+# the /metrics view aggregates all of them.
+PROMETHEUS_MULTIPROC_ROOT = DATA_DIR / 'metrics'
+# Bearer token for Prometheus scrapes of /metrics; unset leaves the endpoint to staff users only
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Opt-in per-task profiling (query capture, DB/network/Python split, sampled cProfile dumps)
+TASK_PROFILING_ENABLED = os.getenv('TASK_PROFILING_ENABLED', 'False') == 'True'
+TASK_PROFILING_SAMPLE_RATE = float(os.getenv('TASK_PROFILING_SAMPLE_RATE', '0.0'))
+TASK_PROFILING_DUPLICATE_THRESHOLD = int(os.getenv('TASK_PROFILING_DUPLICATE_THRESHOLD', '10'))
+# An N+1 warning needs a SELECT repeated more than this many times per processed item (and the threshold above)
+TASK_PROFILING_DUPLICATES_PER_ITEM = 0.5
+PROFILES_DIR = DATA_DIR / 'profiles'
+# Cold-start import budget per process role, checked by `manage.py bench_imports` (see README)
+IMPORT_TIME_BUDGET_MS = {
+    'manage': 600,
+    'web': 900,
+    'worker': 1500,
+    'beat': 1500,
+}
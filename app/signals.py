@@ -2,7 +2,7 @@ from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 from app.models import ScheduledMessage
-from app.tasks import schedule_message_group
+from app.dispatch import enqueue_messages
 
 @receiver(post_save, sender=ScheduledMessage)
 def on_message_save(sender, instance, created, **kwargs):
@@ -26,11 +26,8 @@ def on_recipients_changed(sender, instance, action, **kwargs):
 def _schedule_if_needed(instance):
     now = timezone.now()
     if instance.scheduled_at > now:
-        # Schedule the task
-        task = schedule_message_group.apply_async(
-            args=[instance.id], 
-            eta=instance.scheduled_at
-        )
-        instance.celery_task_id = task.id
+        # Schedule the send on the configured backend
+        task_ids = enqueue_messages([instance.id], eta=instance.scheduled_at)
+        instance.celery_task_id = task_ids[instance.id]
         instance.status = 'SCHEDULED'
         instance.save(update_fields=['status', 'celery_task_id'])
\ No newline at end of file
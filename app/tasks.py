@@ -1,94 +1,164 @@
-import logging
 import asyncio
+import logging
+from asgiref.sync import async_to_sync
 from celery import shared_task
-from django.utils import timezone
 from telethon import errors
 
-from app.gdrive_backup import BackupManager
-from app.models import ScheduledMessage, MessageLog
-from app.telegram_utils import TelethonWrapper
+from app import rollups
+from app.account_health import ensure_account_usable, record_probe
+from app.delivery_errors import AUTH_ERRORS, AccountCoolingDownError, AccountUnavailableError
+from app.idempotency import mark_stale_reservations
+from app.metrics import track_db_queries
+from app.models import ScheduledMessage, TelegramAccount
+from app.profiling import profile_task
+from app.recipient_health import load_deliverable_recipients
+from app.sending import deliver_message, is_current_task
+from app.telegram_utils import ClientPool, TelethonWrapper
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True, max_retries=5)
 def schedule_message_group(self, message_id):
+    with track_db_queries('schedule_message_group'), profile_task('schedule_message_group', self.request.id):
+        return _schedule_message_group(self, message_id)
+
+def _schedule_message_group(self, message_id):
     try:
         msg_obj = ScheduledMessage.objects.get(id=message_id)
     except ScheduledMessage.DoesNotExist:
         logger.error(f"Message {message_id} not found.")
         return
 
+    # Cancelled or re-queued messages exit before touching the network
+    if not is_current_task(msg_obj.status, msg_obj.celery_task_id, self.request.id):
+        logger.info(f"Skipping task {self.request.id}: message {message_id} is {msg_obj.status} or was re-queued.")
+        return
+
     # Mark as processing
     if msg_obj.status != 'PARTIAL':
         msg_obj.status = 'PARTIAL'
         msg_obj.save(update_fields=['status'])
 
     account = msg_obj.account
-    recipients = msg_obj.recipients.all()
+    recipients = load_deliverable_recipients(msg_obj)
     
     # We run the async logic in a sync wrapper
     try:
-        run_async_sending_logic(self, msg_obj, account, recipients)
+        # Cached health only: skips accounts known to be unusable before connecting
+        ensure_account_usable(account.id)
+        completed = run_async_sending_logic(self, msg_obj, account, recipients)
         
-        # If we reach here, update status to SENT
-        msg_obj.status = 'SENT'
-        msg_obj.save(update_fields=['status'])
+        # If we reach here, update status to SENT unless the message was cancelled meanwhile
+        if completed:
+            ScheduledMessage.objects.filter(id=msg_obj.id, status='PARTIAL').update(status='SENT')
         
     except errors.FloodWaitError as e:
         # Critical Telegram Limit - retry task after wait time
         logger.warning(f"FloodWait hit. Retrying in {e.seconds} seconds.")
         raise self.retry(exc=e, countdown=e.seconds + 5)
+    except AccountCoolingDownError as e:
+        logger.info(f"Message {message_id} postponed: {e}")
+        raise self.retry(exc=e, countdown=e.seconds)
+    except AccountUnavailableError as e:
+        # Retrying cannot help until the account is fixed (e.g. re-authorized)
+        logger.error(f"Task aborted: {e}")
+        ScheduledMessage.objects.filter(id=msg_obj.id, status='PARTIAL').update(status='FAILED')
     except Exception as e:
         logger.error(f"Task failed: {e}")
-        msg_obj.status = 'FAILED'
-        msg_obj.save(update_fields=['status'])
+        ScheduledMessage.objects.filter(id=msg_obj.id, status='PARTIAL').update(status='FAILED')
         # Retry with exponential backoff for other errors
         raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
 
 def run_async_sending_logic(task_instance, msg_obj, account, recipients):
     """
-    Helper function to run the async loop inside the synchronous Celery worker.
-    Creates a new event loop.
+    Helper function to run the async sending logic inside the synchronous Celery worker.
+    async_to_sync keeps ORM calls of the coroutine on this thread (and its connection).
+    Returns False if the message was cancelled or re-queued while sending.
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
     async def _process():
-        wrapper = TelethonWrapper(account.session_path, account.api_id, account.api_hash)
+        wrapper = await TelethonWrapper.for_account(account)
         async with wrapper:
-            for recipient in recipients:
-                # Check if already sent successfully to avoid duplicates on retry
-                if MessageLog.objects.filter(message=msg_obj, recipient=recipient, status='SENT').exists():
-                    continue
-
-                target = recipient.username # User ID or Username
-                try:
-                    await wrapper.send_message(target, msg_obj.text, file=msg_obj.media_path)
-                    
-                    MessageLog.objects.create(
-                        message=msg_obj,
-                        recipient=recipient,
-                        status='SENT'
-                    )
-                except errors.FloodWaitError:
-                    raise # Bubbles up to Celery retry
-                except Exception as e:
-                    MessageLog.objects.create(
-                        message=msg_obj,
-                        recipient=recipient,
-                        status='FAILED',
-                        error_text=str(e)
-                    )
-                    # We continue to next recipient, but log the error
-    
-    try:
-        loop.run_until_complete(_process())
-    finally:
-        loop.close()
+            return await deliver_message(msg_obj, recipients, wrapper, task_id=task_instance.request.id)
 
+    return async_to_sync(_process)()
 
-@shared_task
-def perform_backup_task():
+
+@shared_task(bind=True)
+def perform_backup_task(self):
     logger.info("Starting scheduled backup...")
-    BackupManager().perform_backup()
-    logger.info("Backup finished.")
\ No newline at end of file
+    # Lazy so beat and freshly forked workers do not load the Google Drive stack until a backup runs
+    from app.gdrive_backup import BackupManager
+
+    with track_db_queries('perform_backup_task'), profile_task('perform_backup_task', self.request.id):
+        BackupManager().perform_backup()
+    logger.info("Backup finished.")
+
+@shared_task
+def recover_stale_reservations():
+    """
+    Marks SENDING reservations abandoned by crashed workers as STALE and re-queues their
+    interrupted messages, whose new attempt takes the stale reservations over.
+    The send behind a stale reservation may or may not have reached Telegram.
+    """
+    message_ids = mark_stale_reservations()
+    if not message_ids:
+        return
+    resumed = ScheduledMessage.objects.filter(id__in=message_ids, status='PARTIAL').resume()
+    logger.warning(
+        f"Found abandoned delivery reservations for {len(message_ids)} messages; re-queued {resumed} of them."
+    )
+
+@shared_task
+def rollup_message_logs():
+    with track_db_queries('rollup_message_logs'):
+        counted = rollups.rollup_message_logs()
+    if counted:
+        logger.info(f"Rolled up {counted} message logs.")
+
+@shared_task
+def archive_message_logs():
+    """Runs after the rollup so only already counted rows are archived."""
+    rollups.rollup_message_logs()
+    moved = rollups.archive_message_logs()
+    if moved:
+        logger.info(f"Archived {moved} message logs.")
+
+@shared_task
+def probe_account_health(account_ids=None):
+    """
+    Refreshes AccountHealth for active accounts through one pooled client each.
+    Accounts without a stored auth key are marked unauthorized without connecting,
+    since connecting would only create a fresh, unauthorized key.
+    """
+    accounts = TelegramAccount.objects.filter(is_active=True).select_related('telegram_session')
+    if account_ids:
+        accounts = accounts.filter(id__in=account_ids)
+
+    to_probe = []
+    for account in accounts:
+        session = getattr(account, 'telegram_session', None)
+        if session and session.auth_key:
+            to_probe.append(account)
+        else:
+            record_probe(account.id, False, 'No stored session')
+
+    for account_id, authorized, error in async_to_sync(_probe_accounts)(to_probe):
+        record_probe(account_id, authorized, error)
+
+async def _probe_accounts(accounts):
+    pool = ClientPool()
+
+    async def _probe(account):
+        try:
+            async with pool.acquire(account) as wrapper:
+                return account.id, await wrapper.client.is_user_authorized(), None
+        except AUTH_ERRORS as e:
+            return account.id, False, str(e)
+        except Exception as e:
+            # Timeouts, DNS or database errors say nothing about the session: state unknown, never blocks
+            return account.id, None, str(e)
+
+    try:
+        return await asyncio.gather(*(_probe(account) for account in accounts))
+    finally:
+        await pool.close()
\ No newline at end of file
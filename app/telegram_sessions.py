@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession
+
+from app.models import TelegramEntity, TelegramSession
+
+logger = logging.getLogger(__name__)
+
+# Telethon calls session methods synchronously from inside its event loop, where the ORM
+# refuses to run. All database access therefore happens on this single FIFO thread.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='telethon-session')
+
+# Read-through cache: account_id -> (session version, state dict, entity rows); only authorized
+# sessions are cached, and an entry is only reused while TelegramSession.updated_at is unchanged
+_cache = {}
+_cache_lock = threading.Lock()
+
+class DatabaseSession(MemorySession):
+    """
+    Telethon session persisted in TelegramSession / TelegramEntity rows instead of an SQLite file,
+    so any number of workers can use the same account without file locks.
+    Inside an event loop build it with `await DatabaseSession.open(account_id)`, which loads
+    the stored state off the loop; the plain constructor blocks on the database.
+    """
+    def __init__(self, account_id, loaded=None):
+        super().__init__()
+        self.account_id = account_id
+
+        state, rows = loaded if loaded is not None else _executor.submit(_run, _load, account_id).result()
+        if state:
+            self._dc_id = state['dc_id']
+            self._server_address = state['server_address']
+            self._port = state['port']
+            self._takeout_id = state['takeout_id']
+            if state['auth_key']:
+                self._auth_key = AuthKey(data=state['auth_key'])
+        self._entities = set(rows)
+
+    @classmethod
+    async def open(cls, account_id):
+        loaded = await asyncio.get_running_loop().run_in_executor(_executor, _run, _load, account_id)
+        return cls(account_id, loaded)
+
+    def save(self):
+        state = {
+            'dc_id': self._dc_id,
+            'server_address': self._server_address,
+            'port': self._port,
+            'auth_key': self._auth_key.key if self._auth_key else None,
+            'takeout_id': self._takeout_id,
+        }
+        # The write bumps the stored version, the next load re-reads it
+        invalidate(self.account_id)
+        _submit(_save_state, self.account_id, state)
+
+    def process_entities(self, tlo):
+        rows = set(self._entities_to_rows(tlo))
+        new_rows = rows - self._entities
+        if not new_rows:
+            return
+        self._entities |= new_rows
+        with _cache_lock:
+            cached = _cache.get(self.account_id)
+            if cached:
+                cached[2].update(new_rows)
+        _submit(_save_entities, self.account_id, new_rows)
+
+    def delete(self):
+        invalidate(self.account_id)
+        _submit(_delete_session, self.account_id)
+
+def flush():
+    """Blocks until every queued session write has reached the database."""
+    _executor.submit(lambda: None).result()
+
+def invalidate(account_id):
+    """Drops the cached session, e.g. after Telegram rejected its auth key."""
+    with _cache_lock:
+        _cache.pop(account_id, None)
+
+def _load(account_id):
+    """Runs on the session thread; a cheap version query decides whether the cached entry is still valid."""
+    version = TelegramSession.objects.filter(account_id=account_id).values_list('updated_at', flat=True).first()
+    with _cache_lock:
+        cached = _cache.get(account_id)
+        if cached and cached[0] == version:
+            return dict(cached[1]), set(cached[2])
+
+    state, rows = _load_from_db(account_id)
+    with _cache_lock:
+        if state and state['auth_key']:
+            _cache[account_id] = (version, state, set(rows))
+        else:
+            _cache.pop(account_id, None)
+    return state, rows
+
+def _submit(func, *args):
+    _executor.submit(_run, func, *args)
+
+def _run(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    except Exception as e:
+        logger.error(f"Telethon session storage failed in {func.__name__}: {e}")
+        raise
+
+def _load_from_db(account_id):
+    session = TelegramSession.objects.filter(account_id=account_id).first()
+    state = None
+    if session:
+        state = {
+            'dc_id': session.dc_id,
+            'server_address': session.server_address,
+            'port': session.port,
+            'auth_key': bytes(session.auth_key) if session.auth_key else None,
+            'takeout_id': session.takeout_id,
+        }
+    rows = TelegramEntity.objects.filter(account_id=account_id).values_list(
+        'entity_id', 'access_hash', 'username', 'phone', 'name'
+    )
+    return state, set(rows)
+
+def _save_state(account_id, state):
+    TelegramSession.objects.update_or_create(account_id=account_id, defaults=state)
+
+def _save_entities(account_id, rows):
+    # One row per entity id, otherwise the upsert would touch the same row twice
+    by_id = {row[0]: row for row in rows}
+    TelegramEntity.objects.bulk_create(
+        [
+            TelegramEntity(
+                account_id=account_id, entity_id=entity_id, access_hash=access_hash,
+                username=username, phone=phone, name=name,
+            )
+            for entity_id, access_hash, username, phone, name in by_id.values()
+        ],
+        update_conflicts=True,
+        unique_fields=['account', 'entity_id'],
+        update_fields=['access_hash', 'username', 'phone', 'name', 'updated_at'],
+    )
+
+def _delete_session(account_id):
+    TelegramSession.objects.filter(account_id=account_id).delete()
+    TelegramEntity.objects.filter(account_id=account_id).delete()
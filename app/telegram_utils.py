@@ -1,39 +1,110 @@
 import asyncio
 import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from telethon import TelegramClient, errors
 from django.conf import settings
+from app.delivery_errors import AUTH_ERRORS, AccountUnavailableError, SessionNotAuthorizedError
+from app.metrics import ACTIVE_CLIENTS
+from app.profiling import track_network
+from app.telegram_sessions import DatabaseSession, invalidate
 
 logger = logging.getLogger(__name__)
 
 class TelethonWrapper:
-    def __init__(self, session_path, api_id, api_hash):
-        self.session_path = session_path
+    def __init__(self, session, api_id, api_hash, name=None):
+        self.session = session
         self.api_id = api_id
         self.api_hash = api_hash
+        self.name = name or str(session)
         self.client = None
+        # media path -> media of the first sent message, reused instead of uploading again
+        self._sent_media = {}
+
+    @classmethod
+    async def for_account(cls, account):
+        session = await DatabaseSession.open(account.id)
+        return cls(session, account.api_id, account.api_hash, name=str(account))
 
     async def __aenter__(self):
-        self.client = TelegramClient(self.session_path, self.api_id, self.api_hash)
-        await self.client.connect()
+        self.client = TelegramClient(self.session, self.api_id, self.api_hash)
+        with track_network():
+            await self.client.connect()
+        ACTIVE_CLIENTS.inc()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.client:
             await self.client.disconnect()
+            ACTIVE_CLIENTS.dec()
 
-    async def send_message(self, target, text, file=None):
-        if not await self.client.is_user_authorized():
-            raise Exception(f"Session {self.session_path} not authorized.")
+    async def send_message(self, target, text, entities, file=None):
+        """`text` is already plain; `entities` are its formatting entities (see app.templating)."""
+        with track_network():
+            authorized = await self.client.is_user_authorized()
+        if not authorized:
+            invalidate(self.session.account_id)
+            raise SessionNotAuthorizedError(f"Session {self.name} not authorized.")
         
         try:
-            await self.client.send_message(target, text, file=file)
+            with track_network():
+                await self._send(target, text, entities, file)
         except errors.FloodWaitError as e:
             logger.warning(f"FloodWaitError: Need to sleep {e.seconds} seconds")
             raise e 
         except Exception as e:
             logger.error(f"Failed to send to {target}: {e}")
+            if isinstance(e, AUTH_ERRORS):
+                invalidate(self.session.account_id)
             raise e
 
+    async def _send(self, target, message, entities, file):
+        media = self._sent_media.get(file) if file else None
+        if media is not None:
+            try:
+                return await self.client.send_message(target, message, file=media, formatting_entities=entities)
+            except errors.FileReferenceExpiredError:
+                # Cached media went stale, fall back to sending the file itself
+                del self._sent_media[file]
+
+        sent = await self.client.send_message(target, message, file=file, formatting_entities=entities)
+        if file and getattr(sent, 'media', None) is not None:
+            self._sent_media[file] = sent.media
+        return sent
+
+class ClientPool:
+    """
+    Keeps one connected TelethonWrapper per account for the lifetime of an event loop.
+    acquire() serializes work per account while different accounts run concurrently.
+    """
+    def __init__(self):
+        self._wrappers = {}
+        self._locks = defaultdict(asyncio.Lock)
+
+    @asynccontextmanager
+    async def acquire(self, account):
+        async with self._locks[account.id]:
+            wrapper = self._wrappers.get(account.id)
+            if wrapper is not None and not wrapper.client.is_connected():
+                await wrapper.__aexit__(None, None, None)
+                wrapper = None
+            if wrapper is None:
+                wrapper = await TelethonWrapper.for_account(account)
+                await wrapper.__aenter__()
+                self._wrappers[account.id] = wrapper
+            try:
+                yield wrapper
+            except (AccountUnavailableError,) + AUTH_ERRORS:
+                # The client holds a rejected key; the next acquire reloads the session
+                del self._wrappers[account.id]
+                await wrapper.__aexit__(None, None, None)
+                raise
+
+    async def close(self):
+        for wrapper in self._wrappers.values():
+            await wrapper.__aexit__(None, None, None)
+        self._wrappers.clear()
+
 def run_sync(coro):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
@@ -0,0 +1,124 @@
+import copy
+import re
+from functools import lru_cache
+from urllib.parse import quote
+from telethon.extensions import markdown
+from telethon.helpers import add_surrogate, del_surrogate, strip_text
+from telethon.tl.types import MessageEntityTextUrl
+
+PLACEHOLDER_RE = re.compile(r'{{\s*([\w.]+)\s*(?:\|([^}]*))?}}')
+# Stands in for the n-th placeholder while markdown is parsed; private-use characters are not markdown
+SENTINEL_RE = re.compile(r'\ue000(\d+)\ue001')
+
+# Recipient model fields usable as unprefixed placeholders; anything else is looked up in Recipient.attributes
+RECIPIENT_FIELDS = ('name', 'username')
+ATTRIBUTES_PREFIX = 'attributes.'
+
+class CompiledTemplate:
+    """
+    Message text parsed once: markdown is applied to the template itself, so recipient values
+    are inserted as plain text and can never add formatting or links.
+    `parts` alternates literal strings and (source, key, default, length) placeholders, where
+    source is 'field' or 'attribute' and length is the placeholder's UTF-16 length in the parsed text.
+    `entities` are the template's formatting entities, shifted per recipient around the inserted values;
+    `url_parts` holds, per entity, the split URL of a link with placeholders (or an empty tuple).
+    """
+    def __init__(self, parts, entities=(), url_parts=()):
+        self.parts = parts
+        self.entities = entities
+        self.url_parts = url_parts or ((),) * len(entities)
+        self.is_static = all(isinstance(part, str) for part in parts) and not any(self.url_parts)
+
+    def render_many(self, recipients):
+        """
+        Returns a (text, formatting entities) pair per recipient, ready for send_message.
+        A static text is shared by every recipient.
+        """
+        if self.is_static:
+            text = ''.join(self.parts)
+            return [(text, list(self.entities))] * len(recipients)
+        return [self._render_one(recipient) for recipient in recipients]
+
+    def _render_one(self, recipient):
+        chunks = []
+        # (end of the placeholder in the template, length change) in UTF-16 units, as entity offsets are
+        shifts = []
+        position = 0
+        for part in self.parts:
+            if isinstance(part, str):
+                chunks.append(part)
+                position += _utf16_len(part)
+                continue
+            value = _value(part, recipient)
+            chunks.append(value)
+            position += part[3]
+            shifts.append((position, _utf16_len(value) - part[3]))
+
+        entities = []
+        for entity, url_parts in zip(self.entities, self.url_parts):
+            start = entity.offset + sum(delta for end, delta in shifts if end <= entity.offset)
+            stop = entity.offset + entity.length + sum(
+                delta for end, delta in shifts if end <= entity.offset + entity.length
+            )
+            entity = copy.copy(entity)
+            entity.offset, entity.length = start, stop - start
+            if url_parts:
+                entity.url = ''.join(
+                    part if isinstance(part, str) else quote(_value(part, recipient), safe='') for part in url_parts
+                )
+            entities.append(entity)
+
+        # Leading or trailing values may render empty; strip as Telethon's own parser does
+        text = strip_text(add_surrogate(''.join(chunks)), entities)
+        return del_surrogate(text), entities
+
+@lru_cache(maxsize=256)
+def compile_template(text):
+    # Placeholders are swapped out first so markdown inside a key or default (e.g. {{ a__b }}) stays literal
+    placeholders = []
+
+    def _stash(match):
+        placeholders.append(match)
+        return f'\ue000{len(placeholders) - 1}\ue001'
+
+    message, entities = markdown.parse(PLACEHOLDER_RE.sub(_stash, text))
+    url_parts = tuple(
+        _url_parts(entity.url, placeholders) if isinstance(entity, MessageEntityTextUrl) else ()
+        for entity in entities
+    )
+    return CompiledTemplate(_split(message, placeholders), tuple(entities), url_parts)
+
+def _split(text, placeholders):
+    parts = []
+    position = 0
+    for match in SENTINEL_RE.finditer(text):
+        if match.start() > position:
+            parts.append(text[position:match.start()])
+        parts.append(_placeholder(placeholders[int(match.group(1))], _utf16_len(match.group(0))))
+        position = match.end()
+    if position < len(text):
+        parts.append(text[position:])
+    return tuple(parts)
+
+def _placeholder(match, length):
+    key = match.group(1)
+    if key.startswith(ATTRIBUTES_PREFIX):
+        source, key = 'attribute', key[len(ATTRIBUTES_PREFIX):]
+    else:
+        source = 'field' if key in RECIPIENT_FIELDS else 'attribute'
+    return (source, key, (match.group(2) or '').strip(), length)
+
+def _url_parts(url, placeholders):
+    parts = _split(url, placeholders)
+    return parts if any(not isinstance(part, str) for part in parts) else ()
+
+def _value(placeholder, recipient):
+    source, key, default, _ = placeholder
+    if source == 'field':
+        value = getattr(recipient, key)
+    else:
+        value = (recipient.attributes or {}).get(key)
+    return str(value) if value not in (None, '') else default
+
+def _utf16_len(text):
+    return len(text.encode('utf-16-le')) // 2
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path
+from app.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
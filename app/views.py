@@ -0,0 +1,35 @@
+import glob
+import os
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+class MultiDirectoryCollector:
+    """
+    Web and Celery containers write into separate subdirectories of
+    PROMETHEUS_MULTIPROC_ROOT (PIDs collide across containers), so the files of
+    every subdirectory are merged into a single set of metric families.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def collect(self):
+        files = glob.glob(os.path.join(self.root, '*', '*.db'))
+        return MultiProcessCollector.merge(files, accumulate=True)
+
+@require_GET
+def metrics_view(request):
+    # Scrapers authenticate with METRICS_TOKEN; without a token only staff sessions may read metrics
+    token = settings.METRICS_TOKEN
+    has_token = bool(token) and request.headers.get('Authorization') == f"Bearer {token}"
+    if not has_token and not request.user.is_staff:
+        return HttpResponseForbidden()
+
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        registry.register(MultiDirectoryCollector(settings.PROMETHEUS_MULTIPROC_ROOT))
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
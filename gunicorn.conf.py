@@ -0,0 +1,8 @@
+import os
+
+def child_exit(server, worker):
+    # Drops the exited worker's live gauges (e.g. connected clients) from the multiprocess metrics
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from telethon import errors
+
+from app.idempotency import (
+    complete, mark_stale_reservations, new_token, release, reserve, unfinished_recipients,
+)
+from app.models import DeliveryReservation, MessageLog, Recipient, ScheduledMessage, TelegramAccount
+from app.sending import deliver_message
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+class FakeWrapper:
+    def __init__(self, fail_with=None):
+        self.sent = []
+        self.fail_with = fail_with
+
+    async def send_message(self, target, text, entities, file=None):
+        if self.fail_with:
+            raise self.fail_with
+        self.sent.append(target)
+
+class ReservationTestCase(TestCase):
+    def setUp(self):
+        account = TelegramAccount.objects.create(name='Test', api_id=1, api_hash='hash', phone='+1000')
+        self.message = ScheduledMessage.objects.create(
+            account=account, text='Hello', scheduled_at=timezone.now(), status='PARTIAL',
+        )
+        self.recipients = [Recipient.objects.create(username=f'@user{index}') for index in range(3)]
+        self.message.recipients.add(*self.recipients)
+        self.recipient = self.recipients[0]
+
+    def state(self, recipient=None):
+        return DeliveryReservation.objects.get(
+            message=self.message, recipient=recipient or self.recipient
+        ).state
+
+class ReserveTests(ReservationTestCase):
+    def test_live_reservation_is_exclusive(self):
+        self.assertTrue(reserve(self.message.id, self.recipient.id, 'a'))
+        self.assertFalse(reserve(self.message.id, self.recipient.id, 'b'))
+
+    def test_completed_reservation_is_not_taken_again(self):
+        reserve(self.message.id, self.recipient.id, 'a')
+        complete(self.message, self.recipient, 'a', 'SENT')
+
+        self.assertFalse(reserve(self.message.id, self.recipient.id, 'b'))
+        self.assertEqual(self.state(), 'SENT')
+        self.assertEqual(MessageLog.objects.filter(message=self.message, status='SENT').count(), 1)
+
+    def test_failed_reservation_is_retried(self):
+        reserve(self.message.id, self.recipient.id, 'a')
+        complete(self.message, self.recipient, 'a', 'FAILED', 'boom', 'TRANSIENT')
+
+        self.assertTrue(reserve(self.message.id, self.recipient.id, 'b'))
+
+    def test_release_leaves_recipient_unfinished(self):
+        reserve(self.message.id, self.recipient.id, 'a')
+        self.assertFalse(reserve(self.message.id, self.recipient.id, 'b'))
+        release(self.message.id, self.recipient.id, 'a')
+
+        self.assertEqual(self.state(), 'RELEASED')
+        self.assertFalse(MessageLog.objects.filter(message=self.message).exists())
+        self.assertEqual(unfinished_recipients(self.message.id, [self.recipient.id]), [self.recipient.id])
+        self.assertTrue(reserve(self.message.id, self.recipient.id, 'b'))
+
+    def test_release_ignores_reservations_of_other_owners(self):
+        reserve(self.message.id, self.recipient.id, 'a')
+        release(self.message.id, self.recipient.id, 'b')
+
+        self.assertEqual(self.state(), 'SENDING')
+
+    def test_unfinished_recipients_counts_sent_and_failed_as_done(self):
+        first, second, third = self.recipients
+        for recipient in self.recipients:
+            reserve(self.message.id, recipient.id, 'a')
+        complete(self.message, first, 'a', 'SENT')
+        complete(self.message, second, 'a', 'FAILED', 'boom', 'PERMANENT')
+
+        ids = [recipient.id for recipient in self.recipients]
+        self.assertEqual(unfinished_recipients(self.message.id, ids), [third.id])
+
+    @override_settings(SEND_RESERVATION_TTL=60)
+    def test_abandoned_reservation_is_marked_stale_and_taken_over(self):
+        reserve(self.message.id, self.recipient.id, 'a')
+        self.assertEqual(mark_stale_reservations(), set())
+
+        DeliveryReservation.objects.update(reserved_at=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(mark_stale_reservations(), {self.message.id})
+        self.assertEqual(self.state(), 'STALE')
+        self.assertTrue(reserve(self.message.id, self.recipient.id, 'b'))
+        self.assertEqual(self.state(), 'SENDING')
+
+    @override_settings(SEND_RESERVATION_TTL=60)
+    def test_expired_sending_reservation_is_taken_over(self):
+        reserve(self.message.id, self.recipient.id, 'a')
+        DeliveryReservation.objects.update(reserved_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertTrue(reserve(self.message.id, self.recipient.id, 'b'))
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, SEND_BACKEND='celery')
+class DeliverMessageTests(ReservationTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('app.dispatch.revoke_tasks')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_completes_when_every_recipient_has_an_outcome(self):
+        wrapper = FakeWrapper()
+
+        completed = await deliver_message(self.message, self.recipients, wrapper)
+
+        self.assertTrue(completed)
+        self.assertEqual(wrapper.sent, [recipient.username for recipient in self.recipients])
+
+    async def test_skips_recipients_already_sent(self):
+        await self.sync(reserve)(self.message.id, self.recipient.id, 'a')
+        await self.sync(complete)(self.message, self.recipient, 'a', 'SENT')
+        wrapper = FakeWrapper()
+
+        self.assertTrue(await deliver_message(self.message, self.recipients, wrapper))
+        self.assertEqual(wrapper.sent, [recipient.username for recipient in self.recipients[1:]])
+
+    async def test_requeues_while_another_worker_holds_a_recipient(self):
+        await self.sync(reserve)(self.message.id, self.recipient.id, 'other-worker')
+        wrapper = FakeWrapper()
+
+        completed = await deliver_message(self.message, self.recipients, wrapper, task_id='task')
+
+        self.assertFalse(completed)
+        self.assertNotIn(self.recipient.username, wrapper.sent)
+        await self.message.arefresh_from_db()
+        self.assertEqual(self.message.status, 'SCHEDULED')
+        self.assertNotEqual(self.message.celery_task_id, 'task')
+
+    async def test_requeues_after_the_holder_released_its_recipient(self):
+        # The holder hit FloodWait after this worker skipped the recipient
+        await self.sync(reserve)(self.message.id, self.recipient.id, 'other-worker')
+        wrapper = FakeWrapper()
+        original_send = wrapper.send_message
+
+        async def send_and_release(target, *args, **kwargs):
+            await original_send(target, *args, **kwargs)
+            await self.sync(release)(self.message.id, self.recipient.id, 'other-worker')
+
+        wrapper.send_message = send_and_release
+
+        self.assertFalse(await deliver_message(self.message, self.recipients, wrapper))
+        await self.message.arefresh_from_db()
+        self.assertEqual(self.message.status, 'SCHEDULED')
+
+    async def test_flood_wait_releases_the_reservation(self):
+        wrapper = FakeWrapper(fail_with=errors.FloodWaitError(request=None, capture=30))
+
+        with self.assertRaises(errors.FloodWaitError):
+            await deliver_message(self.message, self.recipients, wrapper)
+
+        self.assertEqual(await self.sync(self.state)(), 'RELEASED')
+        self.assertFalse(await MessageLog.objects.filter(message=self.message).aexists())
+
+    @staticmethod
+    def sync(func):
+        from asgiref.sync import sync_to_async
+
+        return sync_to_async(func)
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from telethon.tl.types import MessageEntityBold, MessageEntityItalic, MessageEntityTextUrl
+
+from app.templating import compile_template
+
+def recipient(name='', username='@user', **attributes):
+    return SimpleNamespace(name=name, username=username, attributes=attributes)
+
+def render(text, target):
+    return compile_template(text).render_many([target])[0]
+
+def spans(text, entities):
+    """(entity type, covered text) pairs; offsets are counted in UTF-16 units like Telegram does."""
+    encoded = text.encode('utf-16-le')
+    return [
+        (type(entity), encoded[entity.offset * 2:(entity.offset + entity.length) * 2].decode('utf-16-le'))
+        for entity in entities
+    ]
+
+class CompiledTemplateTests(SimpleTestCase):
+    def test_static_text_is_parsed_once_and_shared(self):
+        template = compile_template('Hello **world**')
+
+        self.assertTrue(template.is_static)
+        first, second = template.render_many([recipient(), recipient()])
+        self.assertEqual(first[0], 'Hello world')
+        self.assertEqual(spans(*first), [(MessageEntityBold, 'world')])
+        self.assertEqual(first, second)
+
+    def test_entities_are_shifted_around_values(self):
+        text, entities = render('Hi {{ name }}, **bold** and __{{ name }}__', recipient(name='Alexandra'))
+
+        self.assertEqual(text, 'Hi Alexandra, bold and Alexandra')
+        self.assertEqual(spans(text, entities), [
+            (MessageEntityBold, 'bold'), (MessageEntityItalic, 'Alexandra'),
+        ])
+
+    def test_offsets_are_counted_in_utf16_units(self):
+        text, entities = render('{{ name }} **ok** {{ city }} __end__', recipient(name='😀🎉', city='Zürich 🏔'))
+
+        self.assertEqual(text, '😀🎉 ok Zürich 🏔 end')
+        self.assertEqual(spans(text, entities), [(MessageEntityBold, 'ok'), (MessageEntityItalic, 'end')])
+
+    def test_values_are_not_parsed_as_markdown(self):
+        text, entities = render('Hi **{{ name }}**', recipient(name='__evil__ [x](https://e.vil)'))
+
+        self.assertEqual(text, 'Hi __evil__ [x](https://e.vil)')
+        self.assertEqual(spans(text, entities), [(MessageEntityBold, '__evil__ [x](https://e.vil)')])
+
+    def test_markdown_characters_in_keys_stay_literal(self):
+        text, entities = render('{{ a__b }} and __x__', recipient(a__b='value'))
+
+        self.assertEqual(text, 'value and x')
+        self.assertEqual(spans(text, entities), [(MessageEntityItalic, 'x')])
+
+    def test_placeholders_in_link_urls_are_quoted(self):
+        text, entities = render(
+            '[Profile of {{ name }}](https://example.com/u/{{ name }}?ref={{ ref|none }})',
+            recipient(name='Ann Lee/2'),
+        )
+
+        self.assertEqual(text, 'Profile of Ann Lee/2')
+        [entity] = entities
+        self.assertIsInstance(entity, MessageEntityTextUrl)
+        self.assertEqual(entity.url, 'https://example.com/u/Ann%20Lee%2F2?ref=none')
+        self.assertEqual(spans(text, entities), [(MessageEntityTextUrl, 'Profile of Ann Lee/2')])
+
+    def test_rendering_does_not_change_the_compiled_entities(self):
+        template = compile_template('**{{ name }}**')
+        compiled = [(entity.offset, entity.length) for entity in template.entities]
+        first, second = template.render_many([recipient(name='a long name'), recipient(name='b')])
+
+        self.assertEqual([(entity.offset, entity.length) for entity in template.entities], compiled)
+        self.assertEqual(spans(*first), [(MessageEntityBold, 'a long name')])
+        self.assertEqual(spans(*second), [(MessageEntityBold, 'b')])
+
+    def test_defaults_and_attribute_namespace(self):
+        target = recipient(name='Field', username='@field')
+        target.attributes['name'] = 'Attribute'
+
+        self.assertEqual(render('{{ name }}/{{ attributes.name }}', target)[0], 'Field/Attribute')
+        self.assertEqual(render('Hi {{ nickname|friend }}', target)[0], 'Hi friend')
+
+    def test_empty_edge_values_are_stripped_with_entities(self):
+        text, entities = render('{{ name }} **hi** {{ name }}', recipient())
+
+        self.assertEqual(text, 'hi')
+        self.assertEqual(spans(text, entities), [(MessageEntityBold, 'hi')])